@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+from collections import namedtuple
+
+import numpy as np
+import pytest  # type: ignore
+
+from primes import factorize, prime_factorization, smallest_factor_table
+
+ArithmeticTables = namedtuple("ArithmeticTables", ["totient", "divisor_count", "divisor_sum", "mobius"])
+
+
+def _prime_power_parts(limit: int):
+    """For every n in [0, limit] split off the largest power of its smallest prime factor, n = p^e * rest.
+    Zero and one come back with p = 0 and rest = 1."""
+    table = smallest_factor_table(limit + 1)
+    values = np.arange(limit + 1, dtype=np.int64)
+    prime = table[: limit + 1].astype(np.int64)
+    exponent = (values > 1).astype(np.int64)
+    power = np.where(values > 1, prime, 1)
+    rest = np.where(values > 1, values // np.maximum(prime, 1), 1)
+
+    # keep dividing while the smallest prime factor still divides, at most log2(limit) passes
+    active = np.flatnonzero((table[rest] == prime) & (values > 1))
+    while active.size:
+        rest[active] //= prime[active]
+        power[active] *= prime[active]
+        exponent[active] += 1
+        active = active[table[rest[active]] == prime[active]]
+    return prime, exponent, power, rest
+
+
+def _multiplicative(rest: np.ndarray, local: np.ndarray) -> np.ndarray:
+    """Combine the value of a multiplicative function on each prime power with its value on the rest.
+
+    ``f(n) = local(n) * f(rest(n))`` where rest(n) has one fewer distinct prime factor, so after k
+    whole-array passes every n with at most k distinct primes is right."""
+    result = local.copy()
+    while True:
+        updated = local * result[rest]
+        if np.array_equal(updated, result):
+            return result
+        result = updated
+
+
+def arithmetic_tables(limit: int) -> ArithmeticTables:
+    """phi(n), d(n), sigma(n) and mu(n) for every n in [0, limit], with zero in the n=0 slot"""
+    if limit < 1:
+        raise ValueError("Need a limit of at least one")
+    prime, exponent, power, rest = _prime_power_parts(limit)
+    base = np.maximum(prime, 2)  # avoid dividing by zero for n <= 1, which are fixed up below
+
+    tables = ArithmeticTables(
+        totient=_multiplicative(rest, np.where(prime > 0, power - power // base, 1)),
+        divisor_count=_multiplicative(rest, exponent + 1),
+        divisor_sum=_multiplicative(rest, np.where(prime > 0, (power * base - 1) // (base - 1), 1)),
+        mobius=_multiplicative(rest, np.where(exponent == 1, -1, np.where(exponent == 0, 1, 0))),
+    )
+    for table in tables:
+        table[0] = 0
+    return tables
+
+
+def totient_table(limit: int) -> np.ndarray:
+    return arithmetic_tables(limit).totient
+
+
+def divisor_count_table(limit: int) -> np.ndarray:
+    return arithmetic_tables(limit).divisor_count
+
+
+def divisor_sum_table(limit: int) -> np.ndarray:
+    return arithmetic_tables(limit).divisor_sum
+
+
+def mobius_table(limit: int) -> np.ndarray:
+    return arithmetic_tables(limit).mobius
+
+
+def totient(value: int) -> int:
+    """Euler's totient, the count of 1 <= k <= n that are coprime to n"""
+    result = value
+    for prime in factorize(value).primes:
+        result -= result // prime
+    return result
+
+
+def divisor_count(value: int) -> int:
+    result = 1
+    for exponent in factorize(value).exponents:
+        result *= exponent + 1
+    return result
+
+
+def divisor_sum(value: int) -> int:
+    result = 1
+    factored = factorize(value)
+    for prime, exponent in zip(factored.primes, factored.exponents):
+        result *= (prime ** (exponent + 1) - 1) // (prime - 1)
+    return result
+
+
+def mobius(value: int) -> int:
+    factored = factorize(value)
+    if any(exponent > 1 for exponent in factored.exponents):
+        return 0
+    return -1 if len(factored.primes) % 2 else 1
+
+
+def _brute_force(value: int):
+    divisors = [k for k in range(1, value + 1) if value % k == 0]
+    coprime = [k for k in range(1, value + 1) if np.gcd(k, value) == 1]
+    factors = prime_factorization(value)
+    square_free = len(set(factors)) == len(factors)
+    return len(coprime), len(divisors), sum(divisors), (-1) ** len(factors) if square_free else 0
+
+
+@pytest.mark.parametrize("value", [1, 2, 6, 12, 30, 64, 97, 210, 360, 1001])
+def test_single_value(value):
+    expected = _brute_force(value)
+    assert (totient(value), divisor_count(value), divisor_sum(value), mobius(value)) == expected
+
+
+def test_tables():
+    limit = 2000
+    tables = arithmetic_tables(limit)
+    for table in tables:
+        assert len(table) == limit + 1
+        assert table[0] == 0
+    for value in range(1, limit + 1, 7):
+        observed = tuple(int(table[value]) for table in tables)
+        assert observed == _brute_force(value), value
+
+
+def test_large_table():
+    limit = 10**6
+    tables = arithmetic_tables(limit)
+    for value in (999_983, 720_720, 2**19, 3**12, 999_999, 1_000_000):
+        assert tables.totient[value] == totient(value)
+        assert tables.divisor_count[value] == divisor_count(value)
+        assert tables.divisor_sum[value] == divisor_sum(value)
+        assert tables.mobius[value] == mobius(value)
+    # Mertens function and totient summatory function checks
+    assert np.sum(tables.mobius) == 212
+    assert np.sum(tables.totient) == 303963552392
+
+
+def test_single_tables():
+    np.testing.assert_equal(totient_table(10), [0, 1, 1, 2, 2, 4, 2, 6, 4, 6, 4])
+    np.testing.assert_equal(divisor_count_table(10), [0, 1, 2, 2, 3, 2, 4, 2, 4, 3, 4])
+    np.testing.assert_equal(divisor_sum_table(10), [0, 1, 3, 4, 7, 6, 12, 8, 15, 13, 18])
+    np.testing.assert_equal(mobius_table(10), [0, 1, -1, -1, 0, -1, 1, -1, 0, 0, 1])
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# performance sweeps for primes.py using pytest-benchmark
+#
+#   python -m pytest bench_primes.py --benchmark-autosave        # store results under .benchmarks/
+#   python -m pytest bench_primes.py --benchmark-compare          # compare against the last saved run
+#   python -m pytest bench_primes.py --benchmark-json=bench.json  # write the results somewhere specific
+import numpy as np
+import pytest  # type: ignore
+
+pytest.importorskip("pytest_benchmark")
+
+import primes  # noqa: E402
+
+MAGNITUDES = [3, 6, 9, 12, 15, 18]
+ARGUMENT_COUNTS = [2, 10, 1000, 100_000]
+# the lcm of random values grows with every argument, so it gets fewer of them
+LCM_ARGUMENT_COUNTS = [2, 10, 1000]
+
+
+def _values(magnitude: int, count: int = 100, seed: int = 0):
+    """Reproducible integers spread over [10^(magnitude-1), 10^magnitude)"""
+    rng = np.random.default_rng(seed + magnitude)
+    return rng.integers(10 ** (magnitude - 1), 10**magnitude, count, dtype=np.uint64)
+
+
+def _run(benchmark, function, *args):
+    """Benchmark ``function`` with the profiling counters recorded for a single call"""
+    primes.reset_counters()
+    primes.enable_counters()
+    try:
+        function(*args)
+    finally:
+        primes.enable_counters(False)
+    benchmark.extra_info.update(primes.counters())
+    return benchmark(function, *args)
+
+
+def _factor_all(values):
+    primes.factorize.cache_clear()  # measure the factoring, not the cache
+    for value in values:
+        primes.prime_factorization(value)
+
+
+@pytest.mark.parametrize("magnitude", MAGNITUDES)
+def test_factorization(benchmark, magnitude):
+    _run(benchmark, _factor_all, _values(magnitude, 20).tolist())
+
+
+@pytest.mark.parametrize("magnitude", MAGNITUDES)
+def test_factorization_cached(benchmark, magnitude):
+    values = _values(magnitude, 20).tolist()
+    _factor_all(values)
+    _run(benchmark, lambda: [primes.prime_factorization(value) for value in values])
+
+
+@pytest.mark.parametrize("magnitude", [3, 6])
+def test_factorize_many(benchmark, magnitude):
+    _run(benchmark, primes.factorize_many, _values(magnitude, 100_000))
+
+
+@pytest.mark.parametrize("magnitude", MAGNITUDES)
+def test_is_prime(benchmark, magnitude):
+    values = _values(magnitude, 1000).tolist()
+    _run(benchmark, lambda: [primes.is_prime(value) for value in values])
+
+
+@pytest.mark.parametrize("magnitude", MAGNITUDES)
+def test_is_prime_many(benchmark, magnitude):
+    _run(benchmark, primes.is_prime_many, _values(magnitude, 100_000))
+
+
+@pytest.mark.parametrize("count", LCM_ARGUMENT_COUNTS)
+@pytest.mark.parametrize("magnitude", [6, 18])
+def test_lcm(benchmark, magnitude, count):
+    _run(benchmark, primes.least_common_multiple, *_values(magnitude, count).tolist())
+
+
+@pytest.mark.parametrize("count", ARGUMENT_COUNTS)
+@pytest.mark.parametrize("magnitude", [6, 18])
+def test_gcf(benchmark, magnitude, count):
+    _run(benchmark, primes.greatest_common_factor, *_values(magnitude, count).tolist())
+
+
+@pytest.mark.parametrize("count", ARGUMENT_COUNTS)
+def test_lcm_array(benchmark, count):
+    _run(benchmark, primes.lcm_array, _values(3, count))
+
+
+@pytest.mark.parametrize("magnitude", [6, 7, 8])
+def test_sieve(benchmark, magnitude):
+    _run(benchmark, primes.primes_between, 0, 10**magnitude)
+
+
+@pytest.mark.parametrize("magnitude", [9, 12, 14])
+def test_sieve_window(benchmark, magnitude):
+    # a fixed width window high up, where sieving with the base primes dominates
+    _run(benchmark, primes.primes_between, 10**magnitude, 10**magnitude + 10**6)
+
+
+@pytest.mark.parametrize("magnitude", [6, 9, 10])
+def test_prime_pi(benchmark, magnitude):
+    _run(benchmark, primes.prime_pi, 10**magnitude)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(pytest.main([__file__, "--benchmark-autosave"]))
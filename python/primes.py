@@ -1,141 +1,1239 @@
 #!/usr/bin/env python
-from collections import defaultdict
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby, islice
+from math import factorial, gcd, isqrt, lcm, log, sqrt
+from multiprocessing import shared_memory
+import json
+import os
+import numpy as np
 from numpy import testing
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+# number of odd values sieved at once, one byte each, so a segment stays resident in the L2 cache
+SEGMENT_SIZE = 1 << 18
 
-def load_primes() -> List[int]:
-    with open("PRIMES", "r") as handle:
-        primes = []
-        for line in handle:
-            if line.startswith("#"):
-                continue
-            else:
-                primes.extend(line.split(","))
-    return sorted([int(i) for i in primes])
+# optional profiling counters, see enable_counters
+_counters: Counter = Counter()
+_counting = False
 
 
-PRIMES = load_primes()
-del load_primes
+def enable_counters(enabled: bool = True) -> None:
+    """Turn the profiling counters on or off. They are off by default so that the hot paths only
+    pay for checking a flag. Work done in worker processes is not counted."""
+    global _counting
+    _counting = enabled
 
 
-def prime_factorization(value: int) -> List[int]:
-    if value == 1:
-        return list()
-        # raise ValueError("One is not a prime number and is not divisible by any prime number")
-    elif value in PRIMES:
-        return [
-            value,
-        ]
+def reset_counters() -> None:
+    _counters.clear()
+
+
+def counters() -> Dict[str, int]:
+    """Snapshot of the profiling counters along with the factorization cache statistics"""
+    info = factorize.cache_info()
+    return {**_counters, "factorize_cache_hits": info.hits, "factorize_cache_misses": info.misses}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    if _counting:
+        _counters[name] += amount
+
+
+def _small_primes(limit: int) -> np.ndarray:
+    """Plain odd-only sieve of Eratosthenes for the primes below ``limit``"""
+    if limit <= 2:
+        return np.empty(0, dtype=np.int64)
+    flags = np.ones(limit // 2, dtype=bool)  # flags[i] is the value 2i+1
+    flags[0] = False
+    for i in range(1, (isqrt(limit - 1) - 1) // 2 + 1):
+        if flags[i]:
+            prime = 2 * i + 1
+            flags[prime * prime // 2 :: prime] = False
+    return np.concatenate(([2], 2 * np.flatnonzero(flags) + 1)).astype(np.int64)
+
+
+def _sieve_segment(low: int, high: int, base: np.ndarray) -> np.ndarray:
+    """Primes in ``[low, high)`` given every prime up to ``isqrt(high - 1)`` in ``base``"""
+    _count("sieve_segments")
+    first = low | 1  # first odd value in the segment
+    if high <= first:
+        return np.array([2] if low <= 2 < high else [], dtype=np.int64)
+    flags = np.ones((high - first + 1) // 2, dtype=bool)  # flags[i] is the value first+2i
+    if first == 1:
+        flags[0] = False
+
+    odd = base[(base > 2) & (base * base < high)]
+    if odd.size:
+        # first odd multiple of each prime that is inside the segment and not below its square
+        starts = np.maximum(odd * odd, (first + odd - 1) // odd * odd)
+        starts += odd * (starts % 2 == 0)
+        for prime, start in zip(odd.tolist(), ((starts - first) // 2).tolist()):
+            flags[start::prime] = False
+
+    primes = 2 * np.flatnonzero(flags) + first
+    if low <= 2 < high:
+        primes = np.concatenate(([2], primes))
+    return primes.astype(np.int64)
+
+
+def iter_prime_segments(low: int, high: int, segment_size: int = SEGMENT_SIZE) -> Iterator[np.ndarray]:
+    """Yield the primes in ``[low, high)`` as sorted arrays, one per sieve segment.
+
+    Only the base primes up to ``sqrt(high)`` and a single segment are held in memory at a time."""
+    low = max(low, 0)
+    if high <= low:
+        return
+    base = _small_primes(isqrt(high - 1) + 1)
+    span = 2 * max(segment_size, isqrt(high))
+    for start in range(low, high, span):
+        yield _sieve_segment(start, min(start + span, high), base)
+
+
+def primes_between(low: int, high: int) -> np.ndarray:
+    """All of the primes in ``[low, high)`` as a sorted array"""
+    segments = list(iter_prime_segments(low, high))
+    if not segments:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(segments)
+
+
+# the wheel used by iter_primes only sieves the values that are coprime to 2, 3 and 5
+WHEEL = 30
+_WHEEL_RESIDUES = np.array([1, 7, 11, 13, 17, 19, 23, 29], dtype=np.int64)
+_WHEEL_INVERSES = {residue: pow(residue, -1, WHEEL) for residue in _WHEEL_RESIDUES.tolist()}
+
+
+def _sieve_wheel(low: int, high: int, base: np.ndarray) -> np.ndarray:
+    """Primes above 5 in ``[low, high)``, where ``low`` is a multiple of ``WHEEL``, using one flag
+    per wheel residue in each block of ``WHEEL`` values"""
+    _count("sieve_segments")
+    flags = np.ones(((high - low + WHEEL - 1) // WHEEL, len(_WHEEL_RESIDUES)), dtype=bool)
+    if low == 0:
+        flags[0, 0] = False  # one is not prime
+
+    sieving = base[(base > 5) & (base * base < high)]
+    if sieving.size:
+        inverses = np.array([_WHEEL_INVERSES[residue] for residue in (sieving % WHEEL).tolist()], dtype=np.int64)
+        lowest = (np.maximum(sieving * sieving, low) + sieving - 1) // sieving  # smallest usable cofactor
+        for column, residue in enumerate(_WHEEL_RESIDUES.tolist()):
+            # the multiples of each prime in this residue class are prime * WHEEL apart, so one block per prime
+            cofactor = lowest + (residue * inverses - lowest) % WHEEL
+            starts = (sieving * cofactor - low) // WHEEL
+            for prime, start in zip(sieving.tolist(), starts.tolist()):
+                flags[start::prime, column] = False
+
+    block, residues = np.nonzero(flags)
+    primes = low + WHEEL * block + _WHEEL_RESIDUES[residues]
+    return primes[primes < high]
+
+
+class PrimeIterator:
+    """Unbounded, resumable iterator over the primes starting from ``start``.
+
+    Primes are sieved a chunk at a time with a wheel-30 segmented sieve whose segments and base
+    primes both grow with sqrt(n), so memory stays O(sqrt(n)). ``checkpoint`` is the value to hand
+    to a new iterator to carry on from where this one stopped."""
+
+    def __init__(self, start: int = 2):
+        self._next = max(start, 0)  # smallest value that has not been produced yet
+        self._low = self._next // WHEEL * WHEEL  # start of the next segment to sieve
+        self._base = np.empty(0, dtype=np.int64)
+        self._base_limit = 0
+        self._buffer = np.empty(0, dtype=np.int64)
+        self._position = 0
+
+    @property
+    def checkpoint(self) -> int:
+        """Every prime below this has been produced"""
+        return self._next
+
+    def _sieve(self) -> np.ndarray:
+        """Sieve segments until one of them has primes that have not been produced yet"""
+        while True:
+            high = self._low + WHEEL * max(SEGMENT_SIZE // len(_WHEEL_RESIDUES), isqrt(self._low) // WHEEL + 1)
+            if self._base_limit * self._base_limit < high:
+                self._base_limit = 2 * isqrt(high) + 1
+                self._base = _small_primes(self._base_limit + 1)
+            primes = _sieve_wheel(self._low, high, self._base)
+            if self._low == 0:
+                primes = np.concatenate(([2, 3, 5], primes)).astype(np.int64)
+            self._low = high
+            primes = primes[primes >= self._next]
+            if primes.size:
+                return primes
+
+    def next_chunk(self) -> np.ndarray:
+        """The next run of primes as an array"""
+        if self._position < len(self._buffer):
+            primes = self._buffer[self._position :]
+        else:
+            primes = self._sieve()
+        self._buffer, self._position = np.empty(0, dtype=np.int64), 0
+        self._next = int(primes[-1]) + 1
+        return primes
+
+    def __iter__(self) -> "PrimeIterator":
+        return self
+
+    def __next__(self) -> int:
+        if self._position >= len(self._buffer):
+            self._buffer, self._position = self._sieve(), 0
+        value = int(self._buffer[self._position])
+        self._position += 1
+        self._next = value + 1
+        return value
+
+
+def iter_primes(start: int = 2) -> PrimeIterator:
+    """Every prime greater than or equal to ``start``, without needing an upper bound"""
+    return PrimeIterator(start)
+
+
+# bump this whenever the layout of the prime cache file changes
+CACHE_VERSION = 1
+# where PRIMES keeps its sieved primes between runs
+PRIME_CACHE = os.environ.get(
+    "PRIMES_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), f"primes.v{CACHE_VERSION}.npy")
+)
+
+
+class PrimeTable:
+    """Sorted view of the primes below ``limit`` that is grown by the segmented sieve when
+    something asks for more primes than it currently holds.
+
+    Nothing is computed until the table is first used. If ``cache`` is given the primes are
+    memory-mapped from that ``.npy`` file, which holds ``[CACHE_VERSION, limit, primes...]`` as
+    int64, and the file is rewritten whenever the table grows past what it holds."""
+
+    def __init__(self, limit: int = 1000, cache: Optional[str] = None):
+        self._initial = limit
+        self._cache = cache
+        self._limit = 0  # nothing loaded yet
+        self._primes = np.empty(0, dtype=np.int64)
+        self._bits: Optional[np.ndarray] = None
+
+    def _load(self) -> None:
+        """Map the primes from the cache file, or sieve the initial ones"""
+        if self._limit:
+            return
+        self._limit = 2
+        if self._cache and os.path.exists(self._cache):
+            try:
+                stored = np.load(self._cache, mmap_mode="r")
+                if stored.dtype == np.int64 and len(stored) >= 2 and stored[0] == CACHE_VERSION:
+                    self._limit = int(stored[1])
+                    self._primes = stored[2:]
+            except (OSError, ValueError):
+                pass  # unreadable cache, just sieve again
+        self.extend_to(self._initial)
+
+    def _save(self) -> None:
+        """Atomically replace the cache file and map the primes back from it"""
+        if not self._cache:
+            return
+        temp = f"{self._cache}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "wb") as handle:
+                np.save(handle, np.concatenate(([CACHE_VERSION, self._limit], self._primes)).astype(np.int64))
+            os.replace(temp, self._cache)
+            self._primes = np.load(self._cache, mmap_mode="r")[2:]
+        except OSError:
+            # read-only location, keep the primes in memory
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    @property
+    def limit(self) -> int:
+        """Every prime below this value is in the table"""
+        self._load()
+        return self._limit
+
+    @property
+    def bits(self) -> np.ndarray:
+        """Odd-only bitset of the table where bit i is set when 2i+1 is prime"""
+        self._load()
+        if self._bits is None:
+            odd = np.zeros((self._limit + 1) // 2, dtype=bool)
+            odd[self._primes[1:] // 2] = True
+            self._bits = np.packbits(odd, bitorder="little")
+        return self._bits
+
+    def extend_to(self, limit: int) -> None:
+        """Make sure that every prime below ``limit`` is in the table"""
+        self._load()
+        if limit <= self._limit:
+            return
+        limit = max(limit, 2 * self._limit)  # grow geometrically so repeated requests are cheap
+        _count("prime_table_extensions")
+        new = [self._primes]
+        new.extend(iter_prime_segments(self._limit, limit))
+        self._primes = np.concatenate(new)
+        self._limit = limit
+        self._bits = None
+        self._save()
+
+    def extend_to_count(self, count: int) -> None:
+        """Make sure that the table holds at least ``count`` primes"""
+        self._load()
+        while len(self._primes) < count:
+            # p_n < n(ln n + ln ln n) for n >= 6
+            estimate = int(count * (log(count) + log(log(count)))) + 1 if count >= 6 else 14
+            self.extend_to(max(estimate, self._limit + 1))
+
+    def upto(self, value: int) -> np.ndarray:
+        """The primes that are less than or equal to ``value``"""
+        self.extend_to(value + 1)
+        return self._primes[: np.searchsorted(self._primes, value, side="right")]
+
+    def lookup(self, values: np.ndarray) -> np.ndarray:
+        """Primality of every value in an array, all of which must be below ``limit``"""
+        values = np.asarray(values, dtype=np.int64)
+        index = values >> 1
+        found = (self.bits[index >> 3] >> (index & 7).astype(np.uint8)) & 1
+        return ((found == 1) & (values & 1 == 1)) | (values == 2)
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._primes)
+
+    def __getitem__(self, index):
+        self._load()
+        if isinstance(index, slice):
+            if index.stop is not None and index.stop > 0:
+                self.extend_to_count(index.stop)
+            return self._primes[index].tolist()
+        if index >= 0:
+            self.extend_to_count(index + 1)
+        return int(self._primes[index])
+
+    def __iter__(self) -> Iterator[int]:
+        self._load()
+        return iter(self._primes.tolist())
+
+    def __contains__(self, value) -> bool:
+        return is_prime(value)
+
+    def __repr__(self) -> str:
+        return f"PrimeTable(limit={self.limit}, count={len(self)})"
+
+
+PRIMES = PrimeTable(cache=PRIME_CACHE)
+
+# values below this are factored by plain trial division, larger ones with Miller-Rabin and Pollard's rho
+TRIAL_DIVISION_MAX = 1 << 24
+# primes below this are divided out of large values before Pollard's rho is started
+PREFILTER_LIMIT = 1000
+# the first 13 primes make Miller-Rabin deterministic below 3.3e24, which covers every 64-bit value
+_MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def is_probable_prime(value: int) -> bool:
+    """Miller-Rabin primality test. This is exact below 3.3e24 and a (very) strong probable
+    prime test above that."""
+    _count("miller_rabin_tests")
+    if value < 2:
+        return False
+    for base in _MILLER_RABIN_BASES:
+        if value % base == 0:
+            return value == base
+
+    # write value - 1 as d * 2^s with d odd
+    d, s = value - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for base in _MILLER_RABIN_BASES:
+        x = pow(base, d, value)
+        if x == 1 or x == value - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % value
+            if x == value - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def is_prime(value: int) -> bool:
+    """Constant time bitset lookup for values inside ``PRIMES``, Miller-Rabin past that"""
+    if value < 2:
+        return False
+    elif value < PRIMES.limit:
+        if value & 1 == 0:
+            return value == 2
+        index = value >> 1
+        return bool((PRIMES.bits[index >> 3] >> (index & 7)) & 1)
     else:
-        factors = []
-        reduced = value
-        for prime in PRIMES:
-            if prime > reduced:
+        return is_probable_prime(value)
+
+
+# bases that make Miller-Rabin deterministic for every 64-bit value, and for every value below 2^32
+_MILLER_RABIN_BASES_64 = (2, 325, 9375, 28178, 450775, 9780504, 1795265022)
+_MILLER_RABIN_BASES_32 = (2, 7, 61)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+def _multiply_high(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Upper 64 bits of the 128-bit products of two uint64 arrays, built from 32-bit halves"""
+    x0, x1 = x & _MASK32, x >> _SHIFT32
+    y0, y1 = y & _MASK32, y >> _SHIFT32
+    cross0 = x0 * y1
+    cross1 = x1 * y0
+    middle = ((x0 * y0) >> _SHIFT32) + (cross0 & _MASK32) + (cross1 & _MASK32)
+    return x1 * y1 + (cross0 >> _SHIFT32) + (cross1 >> _SHIFT32) + (middle >> _SHIFT32)
+
+
+class _SmallModulus:
+    """Modular multiplication for arrays of moduli below 2^32, whose products fit in 64 bits"""
+
+    def __init__(self, modulus: np.ndarray):
+        self.modulus = modulus
+        self.one = np.ones(len(modulus), dtype=np.uint64)
+
+    def multiply(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return a * b % self.modulus
+
+    def convert(self, values: np.ndarray) -> np.ndarray:
+        return values
+
+    def subset(self, index: np.ndarray) -> "_SmallModulus":
+        return _SmallModulus(self.modulus[index])
+
+
+class _Montgomery:
+    """Modular multiplication for arrays of odd uint64 moduli in Montgomery form with R = 2^64,
+    which only needs wrapping 64-bit products and so can not overflow"""
+
+    def __init__(self, modulus: np.ndarray, constants: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        self.modulus = modulus
+        if constants is not None:
+            self.negative_inverse, self.one, self.square = constants
+            return
+        # 1/modulus mod 2^64 from Newton's iteration, each step doubles the number of correct bits
+        inverse = modulus.copy()
+        for _ in range(5):
+            inverse *= np.uint64(2) - modulus * inverse
+        self.negative_inverse = np.uint64(0) - inverse
+        self.one = (np.uint64(0) - modulus) % modulus  # R mod modulus
+        # R^2 mod modulus by doubling R 64 times, watching for the sum wrapping past 2^64
+        square = self.one.copy()
+        for _ in range(64):
+            doubled = square + square
+            square = np.where((doubled < square) | (doubled >= modulus), doubled - modulus, doubled)
+        self.square = square
+
+    def multiply(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        low = a * b
+        high = _multiply_high(a, b)
+        total = high + _multiply_high(low * self.negative_inverse, self.modulus)
+        carried = total + (low != 0).astype(np.uint64)
+        wrapped = (total < high) | (carried < total)
+        return np.where(wrapped | (carried >= self.modulus), carried - self.modulus, carried)
+
+    def convert(self, values: np.ndarray) -> np.ndarray:
+        """Put values that are below the modulus into Montgomery form"""
+        return self.multiply(values, self.square)
+
+    def subset(self, index: np.ndarray) -> "_Montgomery":
+        return _Montgomery(self.modulus[index], (self.negative_inverse[index], self.one[index], self.square[index]))
+
+
+def _miller_rabin_many(values: np.ndarray) -> np.ndarray:
+    """Deterministic vectorized Miller-Rabin for odd uint64 values above the largest base. Each base
+    only runs on the values that survived the previous ones."""
+    _count("miller_rabin_tests", len(values))
+    # write value - 1 as d * 2^s with d odd
+    d = values - np.uint64(1)
+    s = np.zeros(len(values), dtype=np.uint64)
+    even = (d & np.uint64(1)) == 0
+    while even.any():
+        d[even] >>= np.uint64(1)
+        s[even] += np.uint64(1)
+        even = (d & np.uint64(1)) == 0
+
+    prime = np.ones(len(values), dtype=bool)
+    small = values < np.uint64(1 << 32)
+    for bases, alive in (
+        (_MILLER_RABIN_BASES_32, np.flatnonzero(small)),
+        (_MILLER_RABIN_BASES_64, np.flatnonzero(~small)),
+    ):
+        if not alive.size:
+            continue
+        arithmetic = _SmallModulus(values[alive]) if bases is _MILLER_RABIN_BASES_32 else _Montgomery(values[alive])
+        for base in bases:
+            exponent, squarings = d[alive], s[alive]
+            one = arithmetic.one
+            minus_one = arithmetic.modulus - one
+            witness = np.uint64(base) % arithmetic.modulus
+            divides = witness == 0
+            witness = arithmetic.convert(witness)
+
+            # left to right square and multiply over the bits of each exponent
+            x = one.copy()
+            for bit in range(int(exponent.max()).bit_length() - 1, -1, -1):
+                x = arithmetic.multiply(x, x)
+                odd = ((exponent >> np.uint64(bit)) & np.uint64(1)) == 1
+                x = np.where(odd, arithmetic.multiply(x, witness), x)
+
+            passed = divides | (x == one) | (x == minus_one)
+            for step in range(1, int(squarings.max())):
+                pending = ~passed & (np.uint64(step) < squarings)
+                if not pending.any():
+                    break
+                x = arithmetic.multiply(x, x)
+                passed |= pending & (x == minus_one)
+
+            prime[alive[~passed]] = False
+            alive = alive[passed]
+            if not alive.size:
                 break
+            arithmetic = arithmetic.subset(passed)
+    return prime
+
+
+def is_prime_many(values) -> np.ndarray:
+    """Vectorized ``is_prime`` for an integer array.
+
+    Values inside ``PRIMES`` are looked up in its bitset. Larger values that fit in 64 bits are
+    trial divided by the primes below ``PREFILTER_LIMIT`` and whatever survives goes through a
+    vectorized deterministic Miller-Rabin. Anything bigger is tested one at a time."""
+    values = np.asarray(values)
+    result = np.zeros(values.shape, dtype=bool)
+    inside = (values >= 0) & (values < PRIMES.limit)
+    result[inside] = PRIMES.lookup(values[inside])
+
+    outside = ~inside & (values >= 2)
+    if values.dtype.kind in "iu":
+        candidates = values[outside].astype(np.uint64)
+        survivors = (candidates & np.uint64(1)) == 1
+        for prime in PRIMES.upto(PREFILTER_LIMIT)[1:].tolist():
+            survivors &= candidates % np.uint64(prime) != 0
+        survivors[survivors] = _miller_rabin_many(candidates[survivors])
+        result[outside] = survivors
+    else:
+        for index in zip(*np.nonzero(outside)):
+            result[index] = is_probable_prime(int(values[index]))
+    return result
+
+
+def _pollard_brent(value: int) -> int:
+    """Find a non-trivial factor of the odd composite ``value`` using Brent's variant of Pollard's rho"""
+    _count("pollard_rho_splits")
+    batch = 128  # number of differences multiplied together before taking a gcd
+    for c in range(1, value):
+        y, r, q, g = 2, 1, 1, 1
+        x = ys = y
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % value
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(batch, r - k)):
+                    y = (y * y + c) % value
+                    q = q * abs(x - y) % value
+                g = gcd(q, value)
+                k += batch
+            r *= 2
+        if g == value:
+            # the batch overshot, backtrack one step at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % value
+                g = gcd(abs(x - ys), value)
+        if g != value:
+            return g
+    raise ValueError(f"Failed to find a factor of {value}")
+
+
+def _trial_division(value: int, limit: int) -> Tuple[List[int], List[int], int]:
+    """Divide out every prime up to ``limit``. Returns the primes found, their exponents and what
+    is left over."""
+    primes, exponents = [], []
+    reduced = value
+    tried = 0
+    for prime in PRIMES.upto(limit).tolist():
+        if prime * prime > reduced:
+            break
+        tried += 1
+        if reduced % prime == 0:
+            exponent = 0
             while reduced % prime == 0:
-                factors.append(prime)
                 reduced //= prime
-        if reduced == 1:
-            return factors
-        else:
-            raise ValueError(f"Cannot find prime factors of {value}")
+                exponent += 1
+            primes.append(prime)
+            exponents.append(exponent)
+    _count("trial_divisions", tried)
+    return primes, exponents, reduced
 
 
-def first_n_primes(number: int) -> List[int]:
-    if number <= len(PRIMES):
-        return PRIMES[:number]
+def _split_factors(value: int) -> List[int]:
+    """Unsorted prime factors of ``value``, which has no factors below ``PREFILTER_LIMIT``"""
+    if value == 1:
+        return []
+    if is_probable_prime(value):
+        return [value]
+    root = isqrt(value)
+    if root * root == value:
+        return 2 * _split_factors(root)
+    factor = _pollard_brent(value)
+    return _split_factors(factor) + _split_factors(value // factor)
+
+
+# default bound of the smallest prime factor table, 4 bytes per value
+SPF_LIMIT = 1 << 22
+
+_spf_table = np.zeros(0, dtype=np.uint32)
+
+
+def smallest_factor_table(limit: int = SPF_LIMIT) -> np.ndarray:
+    """Smallest prime factor of every value below ``limit`` (zero for 0 and 1). The table is built
+    on first use and rebuilt when a larger bound is requested."""
+    global _spf_table
+    if len(_spf_table) < limit:
+        if limit > 1 << 32:
+            raise ValueError("Smallest prime factor table is limited to 32-bit values")
+        table = np.zeros(limit, dtype=np.uint32)
+        # largest primes first so that smaller primes overwrite them in the shared multiples
+        for prime in PRIMES.upto(isqrt(limit - 1))[::-1].tolist():
+            table[prime * prime :: prime] = prime
+        primes = np.flatnonzero(table == 0)
+        table[primes] = primes
+        table[:2] = 0
+        _spf_table = table
+    return _spf_table
+
+
+def factorize_many(values, limit: int = SPF_LIMIT) -> Tuple[np.ndarray, np.ndarray]:
+    """Prime factorization of every value in an integer array.
+
+    The result is in compressed sparse row form: the factors of ``values[i]`` (with repeats,
+    ascending) are ``factors[offsets[i] : offsets[i + 1]]``. Values below ``limit`` are factored
+    together by walking the smallest prime factor table, anything larger goes through
+    ``prime_factorization`` one at a time."""
+    values = np.asarray(values)
+    if values.ndim != 1:
+        raise ValueError("Can only factor one dimensional arrays")
+    if values.size and values.min() < 0:
+        raise ValueError("Cannot factor negative numbers")
+    values = values.astype(np.uint64)
+    table = smallest_factor_table(limit)
+
+    small = np.flatnonzero(values < len(table))
+    owners, factors = [], []
+
+    # divide out the smallest prime factor of everything that is still above one, one step per pass
+    index = small[values[small] > 1]
+    reduced = values[index].astype(np.intp)
+    while index.size:
+        factor = table[reduced]
+        owners.append(index)
+        factors.append(factor.astype(np.uint64))
+        reduced //= factor
+        keep = reduced > 1
+        index, reduced = index[keep], reduced[keep]
+
+    # scalar path for the values that are past the table
+    for i in np.flatnonzero(values >= len(table)).tolist():
+        found = list(factorize(int(values[i])))
+        owners.append(np.full(len(found), i, dtype=np.intp))
+        factors.append(np.array(found, dtype=np.uint64))
+
+    if not owners:
+        return np.zeros(len(values) + 1, dtype=np.intp), np.empty(0, dtype=np.uint64)
+    owner = np.concatenate(owners)
+    order = np.argsort(owner, kind="stable")  # each value's factors were found in ascending order
+    offsets = np.zeros(len(values) + 1, dtype=np.intp)
+    np.cumsum(np.bincount(owner, minlength=len(values)), out=offsets[1:])
+    return offsets, np.concatenate(factors)[order]
+
+
+class Factorization:
+    """Prime factorization stored as parallel tuples of the distinct primes, ascending, and their
+    exponents. Iterating gives every prime factor with repeats, e.g. 24 gives 2, 2, 2, 3.
+    Instances are shared through the cache in ``factorize``, so they cannot be changed."""
+
+    __slots__ = ("primes", "exponents")
+    primes: Tuple[int, ...]
+    exponents: Tuple[int, ...]
+
+    def __init__(self, primes: Tuple[int, ...] = (), exponents: Tuple[int, ...] = ()):
+        object.__setattr__(self, "primes", tuple(primes))
+        object.__setattr__(self, "exponents", tuple(exponents))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Factorization is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Factorization is immutable")
+
+    def __reduce__(self):
+        return (Factorization, (self.primes, self.exponents))
+
+    @classmethod
+    def from_factors(cls, factors: Iterable[int]) -> "Factorization":
+        """Build from a list of prime factors with repeats, in any order"""
+        grouped = [(prime, len(list(group))) for prime, group in groupby(sorted(factors))]
+        return cls(tuple(prime for prime, _ in grouped), tuple(exponent for _, exponent in grouped))
+
+    def _merge(self, other: "Factorization", combine) -> "Factorization":
+        mine = dict(zip(self.primes, self.exponents))
+        theirs = dict(zip(other.primes, other.exponents))
+        merged = [
+            (prime, combine(mine.get(prime, 0), theirs.get(prime, 0))) for prime in sorted(mine.keys() | theirs.keys())
+        ]
+        merged = [(prime, exponent) for prime, exponent in merged if exponent > 0]
+        return Factorization(tuple(prime for prime, _ in merged), tuple(exponent for _, exponent in merged))
+
+    def lcm(self, other: "Factorization") -> "Factorization":
+        """Factorization of the least common multiple, the larger of each exponent"""
+        return self._merge(other, max)
+
+    def gcd(self, other: "Factorization") -> "Factorization":
+        """Factorization of the greatest common factor, the smaller of each exponent"""
+        return self._merge(other, min)
+
+    def __mul__(self, other: "Factorization") -> "Factorization":
+        return self._merge(other, lambda left, right: left + right)
+
+    def __int__(self) -> int:
+        value = 1
+        for prime, exponent in zip(self.primes, self.exponents):
+            value *= prime**exponent
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        for prime, exponent in zip(self.primes, self.exponents):
+            for _ in range(exponent):
+                yield prime
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Factorization):
+            return NotImplemented
+        return self.primes == other.primes and self.exponents == other.exponents
+
+    def __hash__(self) -> int:
+        return hash((self.primes, self.exponents))
+
+    def __repr__(self) -> str:
+        return (
+            "Factorization("
+            + " * ".join(f"{p}^{e}" if e > 1 else str(p) for p, e in zip(self.primes, self.exponents))
+            + ")"
+        )
+
+
+# number of distinct values whose factorization is remembered by factorize
+FACTORIZATION_CACHE_SIZE = 1 << 14
+
+
+@lru_cache(maxsize=FACTORIZATION_CACHE_SIZE)
+def factorize(value: int) -> Factorization:
+    """Factorization of ``value``. Results are kept in a least-recently-used cache, use
+    ``factorize.cache_info()`` for the hit and miss counts and ``factorize.cache_clear()`` to empty it."""
+    if value < 1:
+        raise ValueError(f"Cannot factor {value}")
+    elif value == 1:
+        return Factorization()
+    elif is_prime(value):
+        return Factorization((value,), (1,))
+    elif value < len(_spf_table):
+        # walk the smallest prime factor table if something already built it
+        factors = []
+        while value > 1:
+            factor = int(_spf_table[value])
+            factors.append(factor)
+            value //= factor
+        return Factorization.from_factors(factors)
+    elif value < TRIAL_DIVISION_MAX:
+        primes, exponents, reduced = _trial_division(value, isqrt(value))
+        if reduced > 1:
+            # whatever is left has no factor below its square root
+            primes.append(reduced)
+            exponents.append(1)
+        return Factorization(tuple(primes), tuple(exponents))
     else:
-        raise ValueError(f"Maximum number of primes is {len(PRIMES)}")
+        primes, exponents, reduced = _trial_division(value, PREFILTER_LIMIT)
+        if reduced < PREFILTER_LIMIT**2:
+            rest = Factorization.from_factors([reduced] if reduced > 1 else [])
+        else:
+            rest = Factorization.from_factors(_split_factors(reduced))
+        return Factorization(tuple(primes) + rest.primes, tuple(exponents) + rest.exponents)
+
 
+def prime_factorization(value: int) -> List[int]:
+    return list(factorize(value))
 
-def _count_factors(factors: List[int]) -> Dict:
-    """Create a dict of prime -> number of times needed"""
-    counted: Dict = defaultdict(lambda: 0)
-    for factor in factors:
-        counted[factor] += 1
-    return dict(counted)
+
+def first_n_primes(number: int) -> List[int]:
+    if number < 0:
+        raise ValueError("Cannot have a negative number of primes")
+    return PRIMES[:number]
 
 
 def least_common_multiple(*args) -> int:
-    # https://byjus.com/maths/lcm/
     if len(args) == 0:
         raise ValueError("Need at least one number")
+    return lcm(*args)
 
-    # all the values are the same
-    if len(set(args)) == 1:
-        return args[0]
 
-    # convert to number of each prime
-    args_primed = [_count_factors(prime_factorization(arg)) for arg in set(args)]
+def greatest_common_factor(*args) -> int:
+    if len(args) == 0:
+        raise ValueError("Need at least one number")
+    return gcd(*args)
 
-    # setup to get the maximum number of each prime
-    factors: Dict = defaultdict(lambda: 0)
-    for primed in args_primed:
-        for factor in primed.keys():
-            factors[factor] = max(factors[factor], primed[factor])
 
-    # find the product of all of the primes
-    lcm = 1
-    for key, value in factors.items():
-        for i in range(value):
-            lcm *= key
+def lcm_iter(values: Iterable[int]) -> int:
+    """Least common multiple of a stream of numbers without holding on to them"""
+    result = None
+    for value in values:
+        result = value if result is None else lcm(result, value)
+    if result is None:
+        raise ValueError("Need at least one number")
+    return abs(result)
 
-    return lcm
 
+def gcf_iter(values: Iterable[int]) -> int:
+    """Greatest common factor of a stream of numbers, stopping early once it reaches one"""
+    result = None
+    for value in values:
+        result = value if result is None else gcd(result, value)
+        if result == 1:
+            break
+    if result is None:
+        raise ValueError("Need at least one number")
+    return abs(result)
 
-def greatest_common_factor(*args) -> int:
-    # https://byjus.com/maths/gcf/
-    if len(args) == 0:
+
+def gcf_array(values) -> int:
+    """Greatest common factor of every value in an integer array"""
+    values = np.asarray(values)
+    if values.size == 0:
+        raise ValueError("Need at least one number")
+    return int(np.gcd.reduce(values, axis=None))
+
+
+def lcm_array(values) -> int:
+    """Least common multiple of every value in an integer array.
+
+    Pairs are combined as a vectorized tree reduction in int64 until the next level would
+    overflow, then the remaining partial results are finished as python integers."""
+    values = np.asarray(values)
+    if values.size == 0:
         raise ValueError("Need at least one number")
+    if values.dtype == np.uint64 and values.max() > np.iinfo(np.int64).max:
+        return lcm(*values.ravel().tolist())
+    values = np.unique(np.abs(values.astype(np.int64)))
+    if values[0] == 0:
+        return 0
+
+    maximum = np.iinfo(np.int64).max
+    while len(values) > 1:
+        if len(values) % 2:
+            values = np.append(values, 1)
+        left, right = values[0::2], values[1::2]
+        reduced = left // np.gcd(left, right)
+        if np.any(reduced > maximum // right):
+            return lcm(*values.tolist())
+        values = reduced * right
+    return int(values[0])
+
+
+def _product_tree(values: Iterable[int]) -> int:
+    """Product of many integers multiplied in balanced pairs, so the big multiplications are
+    between numbers of similar size"""
+    values = list(values)
+    if not values:
+        return 1
+    while len(values) > 1:
+        paired = [values[i] * values[i + 1] for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
+
+
+def _largest_powers(number: int) -> List[int]:
+    """p^floor(log_p(number)) for every prime p up to ``number``"""
+    primes = PRIMES.upto(number)
+    powers = primes.copy()
+    # only the primes up to sqrt(number) have a square that fits
+    repeated = np.flatnonzero(primes * primes <= number)
+    while repeated.size:
+        powers[repeated] *= primes[repeated]
+        repeated = repeated[powers[repeated] * primes[repeated] <= number]
+    return powers.tolist()
+
+
+def lcm_upto(number: int) -> int:
+    """Least common multiple of 1, 2, ..., ``number``, the product of the largest power of each
+    prime that does not exceed ``number``"""
+    if number < 1:
+        raise ValueError("Need at least one number")
+    return _product_tree(_largest_powers(number))
+
+
+def primorial(number: int) -> int:
+    """Product of every prime up to ``number``"""
+    return _product_tree(PRIMES.upto(number).tolist())
+
+
+def legendre_exponent(number: int, prime: int) -> int:
+    """Exponent of ``prime`` in ``number!`` from Legendre's formula, the sum of number // prime^k"""
+    if prime < 2:
+        raise ValueError(f"{prime} is not a prime")
+    if number < 0:
+        raise ValueError("Cannot take the factorial of a negative number")
+    exponent = 0
+    while number:
+        number //= prime
+        exponent += number
+    return exponent
+
+
+def factorial_factorization(number: int) -> Factorization:
+    """Factorization of ``number!`` with every exponent from Legendre's formula at once"""
+    primes = PRIMES.upto(number)
+    exponents = np.zeros(len(primes), dtype=np.int64)
+    reduced = np.full(len(primes), number, dtype=np.int64)
+    active = np.arange(len(primes))
+    while active.size:
+        reduced[active] //= primes[active]
+        exponents[active] += reduced[active]
+        active = active[reduced[active] >= primes[active]]
+    return Factorization(tuple(primes.tolist()), tuple(exponents.tolist()))
+
+
+# numbers handed to each worker at a time by primes_in_range and factor_range
+PARALLEL_SIEVE_CHUNK = 1 << 24
+PARALLEL_FACTOR_CHUNK = 1 << 16
+
+_base_primes = np.empty(0, dtype=np.int64)  # per worker view of the shared base primes
+_base_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _attach_base_primes(name: str, count: int) -> None:
+    """Pool initializer that maps the base primes the parent put in shared memory"""
+    global _base_primes, _base_memory
+    _base_memory = shared_memory.SharedMemory(name=name)
+    _base_primes = np.ndarray((count,), dtype=np.int64, buffer=_base_memory.buf)
+
+
+def _sieve_chunk(low: int, high: int, base: Optional[np.ndarray] = None) -> np.ndarray:
+    """Pool workers leave ``base`` out and use the primes attached from shared memory"""
+    if base is None:
+        base = _base_primes
+    span = 2 * SEGMENT_SIZE
+    segments = [_sieve_segment(start, min(start + span, high), base) for start in range(low, high, span)]
+    return np.concatenate(segments) if segments else np.empty(0, dtype=np.int64)
+
+
+def _factor_segment(low: int, high: int, base: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Factor every value in ``[low, high)`` by sieving out each base prime with its multiplicity.
+    Returns the factors in the same offsets/factors form as ``factorize_many``."""
+    remaining = np.arange(low, high, dtype=np.int64)
+    remaining[remaining < 2] = 1  # zero and one have no factors
+    owners, factors = [], []
+    for prime in base[base * base < high].tolist():
+        index = np.arange((-low) % prime, high - low, prime)
+        index = index[remaining[index] % prime == 0]
+        while index.size:
+            owners.append(index)
+            factors.append(np.full(index.size, prime, dtype=np.int64))
+            remaining[index] //= prime
+            index = index[remaining[index] % prime == 0]
+    # whatever is left is a prime larger than every base prime
+    index = np.flatnonzero(remaining > 1)
+    owners.append(index)
+    factors.append(remaining[index])
+
+    owner = np.concatenate(owners)
+    order = np.argsort(owner, kind="stable")
+    offsets = np.zeros(high - low + 1, dtype=np.intp)
+    np.cumsum(np.bincount(owner, minlength=high - low), out=offsets[1:])
+    return offsets, np.concatenate(factors)[order]
+
+
+def _factor_chunk(low: int, high: int, base: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    return _factor_segment(low, high, _base_primes if base is None else base)
+
+
+def _in_order(pool, function, tasks: Iterable[tuple], ahead: int) -> Iterator[Tuple[tuple, object]]:
+    """Yield ``(args, function(*args))`` for every task in order, keeping at most ``ahead`` tasks
+    in flight on the pool so that memory does not grow with the number of tasks"""
+    pending: deque = deque()
+    todo = iter(tasks)
+    for args in islice(todo, ahead):
+        pending.append((args, pool.submit(function, *args)))
+    while pending:
+        args, future = pending.popleft()
+        for next_args in islice(todo, 1):
+            pending.append((next_args, pool.submit(function, *next_args)))
+        yield args, future.result()
+
+
+def _run_chunks(function, low: int, high: int, chunk: int, workers: Optional[int]) -> Iterator:
+    """Run ``function(start, stop)`` over ``[low, high)`` in chunks on a process pool with the
+    base primes in shared memory, yielding ``(start, result)`` in order"""
+    starts = range(low, high, chunk)
+    # generated as they are needed so that memory stays flat however long the range is
+    chunks = ((start, min(start + chunk, high)) for start in starts)
+    workers = workers or os.cpu_count() or 1
+    base = _small_primes(isqrt(max(high, 1) - 1) + 1)
+
+    if workers == 1 or len(starts) <= 1:
+        # pass the base primes along so that interleaved generators do not share them
+        for start, stop in chunks:
+            yield start, function(start, stop, base)
+        return
+
+    memory = shared_memory.SharedMemory(create=True, size=max(base.nbytes, 1))
+    try:
+        np.ndarray(base.shape, dtype=np.int64, buffer=memory.buf)[:] = base
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach_base_primes, initargs=(memory.name, len(base))
+        ) as pool:
+            for (start, _), result in _in_order(pool, function, chunks, 2 * workers):
+                yield start, result
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def primes_in_range(
+    low: int, high: int, workers: Optional[int] = None, chunk: int = PARALLEL_SIEVE_CHUNK
+) -> Iterator[np.ndarray]:
+    """Yield the primes in ``[low, high)`` in order as arrays, sieving ``chunk`` numbers at a time
+    in parallel on ``workers`` processes (default is every core)"""
+    for _, primes in _run_chunks(_sieve_chunk, max(low, 0), high, chunk, workers):
+        yield primes
+
 
-    # all the values are the same
-    if len(set(args)) == 1:
-        return args[0]
-
-    # convert to number of each prime
-    args_primed = [_count_factors(prime_factorization(arg)) for arg in set(args)]
-
-    # collect all primes
-    primes = set()
-    for primed in args_primed:
-        for key in primed.keys():
-            primes.add(key)
-
-    # get the list of primes that exist in everything
-    primes_reduced = set()
-    for prime in primes:
-        prime_in_all = True
-        for factored in args_primed:
-            if prime not in factored:
-                prime_in_all = False
-        if prime_in_all:
-            primes_reduced.add(prime)
-
-    # get the minimum number or primes in everything
-    counted: Dict = {}
-    for prime in primes_reduced:
-        for factored in args_primed:
-            if prime in counted:
-                counted[prime] = min(counted[prime], factored[prime])
+def factor_range(
+    low: int, high: int, workers: Optional[int] = None, chunk: int = PARALLEL_FACTOR_CHUNK
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(values, offsets, factors)`` for consecutive chunks of ``[low, high)`` where the
+    factors of ``values[i]`` are ``factors[offsets[i] : offsets[i + 1]]``. Chunks of ``chunk``
+    numbers are factored in parallel on ``workers`` processes (default is every core) and come
+    back in order."""
+    for start, (offsets, factors) in _run_chunks(_factor_chunk, max(low, 0), high, chunk, workers):
+        yield np.arange(start, start + len(offsets) - 1, dtype=np.int64), offsets, factors
+
+
+def prime_pi(value: int) -> int:
+    """Number of primes less than or equal to ``value``.
+
+    Past the prime table this uses Lucy_Hedgehog's O(x^(3/4)) method, which only tracks the
+    counts at the O(sqrt(x)) distinct values of x // i rather than the primes themselves."""
+    if value < 2:
+        return 0
+    if value < PRIMES.limit:
+        return len(PRIMES.upto(value))
+
+    root = isqrt(value)
+    # small[v] counts the survivors in [2, v] for v <= root, large[i] those in [2, value // i]
+    small = np.arange(-1, root, dtype=np.int64)
+    small[0] = 0
+    large = np.zeros(root + 1, dtype=np.int64)
+    large[1:] = value // np.arange(1, root + 1, dtype=np.int64) - 1
+    for prime in _small_primes(root + 1).tolist():
+        below = int(small[prime - 1])  # primes before this one
+        square = prime * prime
+        # remove the survivors whose smallest factor is this prime. Every read is from a value
+        # that has not been updated for this prime yet, so it can be done a whole array at a time.
+        stop = min(root, value // square)
+        multiple = np.arange(prime, stop * prime + 1, prime, dtype=np.int64)
+        inside = multiple <= root
+        counts = np.empty(stop, dtype=np.int64)
+        counts[inside] = large[multiple[inside]]
+        counts[~inside] = small[value // multiple[~inside]]
+        large[1 : stop + 1] -= counts - below
+        if square <= root:
+            small[square:] -= small[np.arange(square, root + 1) // prime] - below
+    return int(large[1])
+
+
+def _logarithmic_integral(value: float) -> float:
+    """li(x) from Ramanujan's series"""
+    log_value = log(value)
+    total, term, inner = 0.0, 1.0, 0.0
+    for n in range(1, 200):
+        term *= log_value / n
+        if n % 2 == 1:
+            inner += 1.0 / n
+        step = (-1) ** (n - 1) * term / 2 ** (n - 1) * inner
+        total += step
+        if abs(step) < 1e-17 * abs(total):
+            break
+    return 0.5772156649015329 + log(log_value) + sqrt(value) * total
+
+
+def nth_prime(number: int) -> int:
+    """The ``number``-th prime, counting 2 as the first.
+
+    Past the prime table this inverts the logarithmic integral to land near the answer, counts the
+    primes up to there with ``prime_pi`` and sieves the (roughly sqrt sized) gap that is left."""
+    if number < 1:
+        raise ValueError("The first prime is number 1")
+    if number <= len(PRIMES):
+        return PRIMES[number - 1]
+
+    # Newton's method on li(x) = number
+    guess = number * (log(number) + log(log(number))) if number >= 6 else 13
+    for _ in range(50):
+        step = (_logarithmic_integral(guess) - number) * log(guess)
+        guess -= step
+        if abs(step) < 1:
+            break
+    guess = int(guess)
+
+    count = prime_pi(guess)
+    window = max(isqrt(guess), SEGMENT_SIZE)
+    if count < number:
+        # walk forward from the guess
+        low = guess + 1
+        while True:
+            primes = primes_between(low, low + window)
+            if count + len(primes) >= number:
+                return int(primes[number - count - 1])
+            count += len(primes)
+            low += window
+    else:
+        # walk backward, the guess is at or past the answer
+        high = guess + 1
+        while True:
+            primes = primes_between(max(high - window, 0), high)
+            if count - len(primes) < number:
+                return int(primes[number - count - 1])
+            count -= len(primes)
+            high -= window
+
+
+# number of input lines handed to a worker at a time in batch mode
+BATCH_LINES = 4096
+BATCH_OPERATIONS = ("factor", "lcm", "gcf")
+BATCH_FORMATS = ("tsv", "jsonl")
+
+
+def _parse_line(line: str) -> List[int]:
+    """Integers on a line separated by whitespace or commas. Blank lines and comments are empty."""
+    line = line.split("#", 1)[0]
+    return [int(item) for item in line.replace(",", " ").split()]
+
+
+def _batch_error(output_format: str, number: int, text: str, error: Exception) -> str:
+    """Output line for input that could not be processed, the tab separated form has an empty answer and the
+    error in a third column"""
+    if output_format == "tsv":
+        return f"{text}\t\tline {number}: {error}"
+    return json.dumps({"line": number, "input": text, "error": str(error)})
+
+
+def _batch_lines(operation: str, output_format: str, lines: List[str], first: int = 1) -> List[str]:
+    """Process a group of input lines, the first of which is line number ``first``, into output lines.
+    Bad input is reported in the output rather than stopping the batch."""
+    result = []
+    for number, line in enumerate(lines, start=first):
+        try:
+            values = _parse_line(line)
+        except ValueError as e:
+            result.append(_batch_error(output_format, number, line.strip(), e))
+            continue
+        if not values:
+            continue
+        if operation == "factor":
+            for value in values:
+                try:
+                    factors = prime_factorization(value)
+                except (ValueError, RuntimeError) as e:
+                    result.append(_batch_error(output_format, number, str(value), e))
+                    continue
+                if output_format == "tsv":
+                    result.append(f"{value}\t{' '.join(str(factor) for factor in factors)}")
+                else:
+                    result.append(json.dumps({"value": value, "factors": factors}))
+        else:
+            answer = least_common_multiple(*values) if operation == "lcm" else greatest_common_factor(*values)
+            if output_format == "tsv":
+                result.append(f"{' '.join(str(value) for value in values)}\t{answer}")
             else:
-                counted[prime] = factored[prime]
+                result.append(json.dumps({"values": values, operation: answer}))
+    return result
+
+
+def process_batch(
+    lines: Iterable[str], operation: str = "factor", output_format: str = "tsv", workers: int = 1
+) -> Iterator[str]:
+    """Stream output lines for a stream of input lines.
+
+    With ``operation="factor"`` every integer is factored, otherwise each line's integers are
+    reduced to their ``lcm`` or ``gcf``. The output is tab separated (input, then answer) or
+    JSON lines. Lines are read ``BATCH_LINES`` at a time and, with more than one worker, processed
+    on a process pool; either way the output is in input order and memory does not grow with the
+    input. Lines that cannot be parsed or factored produce an error record with their line number."""
+    if operation not in BATCH_OPERATIONS:
+        raise ValueError(f'Unknown operation "{operation}"')
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f'Unknown output format "{output_format}"')
+
+    lines = iter(lines)
+    groups = iter(lambda: list(islice(lines, BATCH_LINES)), [])
+    tasks = ((operation, output_format, group, 1 + i * BATCH_LINES) for i, group in enumerate(groups))
+    if workers == 1:
+        for task in tasks:
+            yield from _batch_lines(*task)
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _, result in _in_order(pool, _batch_lines, tasks, 2 * workers):
+                yield from result  # type: ignore
+
+
+_saved_primes: Optional[Tuple[PrimeTable, Optional[str]]] = None
 
-    # find the product of all of the primes
-    gcf = 1
-    for key, value in counted.items():
-        for i in range(value):
-            gcf *= key
 
-    return gcf
+def setup_module():
+    """Keep the tests away from the real prime cache, anything they sieve goes to a temporary file"""
+    import tempfile
+
+    global PRIMES, _saved_primes
+    _saved_primes = (PRIMES, os.environ.get("PRIMES_CACHE"))
+    cache = os.path.join(tempfile.mkdtemp(prefix="primes-test-"), f"primes.v{CACHE_VERSION}.npy")
+    os.environ["PRIMES_CACHE"] = cache  # for worker processes that import this module afresh
+    PRIMES = PrimeTable(cache=cache)
+
+
+def teardown_module():
+    import shutil
+
+    global PRIMES, _saved_primes
+    if _saved_primes is None:
+        return
+    cache = PRIMES._cache
+    PRIMES, environ = _saved_primes
+    _saved_primes = None
+    if environ is None:
+        os.environ.pop("PRIMES_CACHE", None)
+    else:
+        os.environ["PRIMES_CACHE"] = environ
+    if cache:
+        shutil.rmtree(os.path.dirname(cache), ignore_errors=True)
 
 
 def test_prime_factorization():
     # 1 isn't prime
     assert prime_factorization(1) == []
+    for value in (0, -1, -12):
+        testing.assert_raises(ValueError, prime_factorization, value)
 
     # check that all the primes are factored as just themselves
-    for prime in PRIMES:
+    for prime in PRIMES.upto(997).tolist():
         assert prime_factorization(prime) == [prime]
 
     # check other prime factorizations
@@ -159,11 +1257,368 @@ def test_prime_factorization():
     testing.assert_equal(prime_factorization(30), [2, 3, 5])
 
 
+def test_sieve():
+    # the segmented sieve agrees with the simple one, including across segment boundaries
+    expected = _small_primes(100_000)
+    testing.assert_equal(primes_between(0, 100_000), expected)
+    observed = np.concatenate(list(iter_prime_segments(0, 100_000, segment_size=1000)))
+    testing.assert_equal(observed, expected)
+    testing.assert_equal(primes_between(90, 110), [97, 101, 103, 107, 109])
+    testing.assert_equal(primes_between(2, 3), [2])
+    testing.assert_equal(primes_between(10, 10), [])
+
+    # there are 168 primes below 1000 and 78498 below a million
+    assert len(PrimeTable(1000)) == 168
+    assert len(primes_between(0, 1_000_000)) == 78498
+    testing.assert_equal(
+        primes_between(10**10, 10**10 + 100), [10000000019, 10000000033, 10000000061, 10000000069, 10000000097]
+    )
+
+
+def test_prime_cache():
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = os.path.join(directory, "primes.npy")
+
+        # nothing happens until the table is used
+        table = PrimeTable(1000, cache=cache)
+        assert not os.path.exists(cache)
+        assert len(table) == 168
+        assert os.path.exists(cache)
+
+        # a new table picks up what the first one sieved and regrows the file when asked for more
+        table = PrimeTable(10, cache=cache)
+        assert table.limit == 1000
+        assert isinstance(table.upto(1000), np.memmap)
+        table.extend_to(5000)
+        assert PrimeTable(cache=cache).limit == table.limit >= 5000
+        testing.assert_equal(PrimeTable(cache=cache).upto(5000), primes_between(0, 5001))
+
+        # stale versions are ignored
+        np.save(cache, np.array([CACHE_VERSION + 1, 10**6, 2, 3], dtype=np.int64))
+        assert PrimeTable(100, cache=cache).limit == 100
+        assert len(PrimeTable(10, cache=cache)) == 25
+
+
+def test_first_n_primes():
+    testing.assert_equal(first_n_primes(5), [2, 3, 5, 7, 11])
+    primes = first_n_primes(1000)  # well past the original 168
+    assert len(primes) == 1000
+    assert primes[-1] == 7919
+    assert PRIMES[9999] == 104729
+
+
+def test_large_factorization():
+    testing.assert_equal(prime_factorization(1009), [1009])
+    testing.assert_equal(prime_factorization(1009 * 1013), [1009, 1013])
+    testing.assert_equal(prime_factorization(9_999_991), [9999991])
+    testing.assert_equal(prime_factorization(2**5 * 7919**2), [2, 2, 2, 2, 2, 7919, 7919])
+
+
+def test_is_probable_prime():
+    # agrees with the sieve for small values
+    expected = np.zeros(10_000, dtype=bool)
+    expected[primes_between(0, 10_000)] = True
+    testing.assert_equal([is_probable_prime(i) for i in range(10_000)], expected)
+
+    # strong pseudoprimes to several of the small bases
+    for value in (3215031751, 3825123056546413051, 318665857834031151167461):
+        assert not is_probable_prime(value)
+    assert is_probable_prime(2**61 - 1)
+    assert is_probable_prime(2**89 - 1)
+    assert not is_probable_prime((2**61 - 1) * (2**31 - 1))
+
+
+def test_pollard_rho():
+    # 64-bit and larger semiprimes
+    testing.assert_equal(prime_factorization(600851475143), [71, 839, 1471, 6857])
+    testing.assert_equal(prime_factorization(4294967291 * 4294967279), [4294967279, 4294967291])
+    testing.assert_equal(prime_factorization(2**64 + 1), [274177, 67280421310721])
+    testing.assert_equal(prime_factorization(1000003**2 * 999983), [999983, 1000003, 1000003])
+    value = 2**3 * 3 * 1000000007 * 1000000009 * 998244353 * (2**61 - 1)  # 43 digits
+    testing.assert_equal(prime_factorization(value), [2, 2, 2, 3, 998244353, 1000000007, 1000000009, 2**61 - 1])
+
+
+def test_factorize_many():
+    values = np.array([0, 1, 2, 12, 97, 1024, 999983 * 2, 2**40 + 15, 30], dtype=np.uint64)
+    offsets, factors = factorize_many(values, limit=1 << 16)
+    assert len(offsets) == len(values) + 1
+    assert offsets[1] == offsets[0]  # zero has no factors
+    for i, value in enumerate(values.tolist()[1:], start=1):
+        testing.assert_equal(factors[offsets[i] : offsets[i + 1]], prime_factorization(value))
+
+    # the table agrees with the sieve and drives the scalar path once it exists
+    table = smallest_factor_table(1 << 16)
+    testing.assert_equal(np.flatnonzero(table[: 1 << 16] == np.arange(1 << 16))[1:], primes_between(0, 1 << 16))
+    for value in range(1, 1000):
+        assert np.prod(prime_factorization(value)) == value
+
+    # empty input
+    offsets, factors = factorize_many(np.array([], dtype=np.uint32))
+    testing.assert_equal(offsets, [0])
+    assert factors.size == 0
+
+
+def test_is_prime():
+    limit = min(PRIMES.limit, 100_000)  # the cached table may be much larger
+    expected = np.zeros(limit, dtype=bool)
+    expected[primes_between(0, limit)] = True
+    testing.assert_equal([is_prime(i) for i in range(limit)], expected)
+    testing.assert_equal(is_prime_many(np.arange(limit)), expected)
+    assert 997 in PRIMES
+    assert 1001 not in PRIMES
+
+    # past the table
+    values = np.array([[PRIMES.limit + 1, 2**31 - 1], [2**32 + 15, 2**62 - 57]], dtype=np.uint64)
+    testing.assert_equal(is_prime_many(values), [[is_prime(PRIMES.limit + 1), True], [True, True]])
+    testing.assert_equal(is_prime_many([-7, 0, 1, 2]), [False, False, False, True])
+
+
+def test_parallel_range():
+    for workers in (1, 2):
+        observed = list(primes_in_range(0, 100_000, workers=workers, chunk=7_000))
+        assert len(observed) == 15
+        testing.assert_equal(np.concatenate(observed), primes_between(0, 100_000))
+
+        start = 10**9
+        values = []
+        for chunk_values, offsets, factors in factor_range(start, start + 500, workers=workers, chunk=64):
+            for i, value in enumerate(chunk_values.tolist()):
+                testing.assert_equal(factors[offsets[i] : offsets[i + 1]], prime_factorization(value))
+            values.extend(chunk_values.tolist())
+        testing.assert_equal(values, list(range(start, start + 500)))
+
+    values, offsets, factors = next(factor_range(0, 5, workers=1))
+    testing.assert_equal(values, [0, 1, 2, 3, 4])
+    testing.assert_equal(offsets, [0, 0, 0, 1, 2, 4])
+
+    # interleaved generators each keep their own base primes
+    start = 10**12
+    big = primes_in_range(start, start + 3 * 10**4, workers=1, chunk=10**4)
+    next(big)
+    next(primes_in_range(0, 1000, workers=1))
+    testing.assert_equal(next(big), primes_between(start + 10**4, start + 2 * 10**4))
+    big_factors = factor_range(start, start + 200, workers=1, chunk=100)
+    next(big_factors)
+    next(factor_range(0, 10, workers=1))
+    values, offsets, factors = next(big_factors)
+    for i, value in enumerate(values.tolist()):
+        testing.assert_equal(factors[offsets[i] : offsets[i + 1]], prime_factorization(value))
+
+
+def test_prime_pi():
+    for value, expected in ((0, 0), (2, 1), (10, 4), (1000, 168), (7919, 1000), (10**6, 78498)):
+        assert prime_pi(value) == expected
+    # past the table
+    for value, expected in ((10**8, 5761455), (10**9, 50847534), (10**9 + 7, 50847535)):
+        assert prime_pi(value) == expected
+    for value in (10_000_019, 123_456_789):
+        assert prime_pi(value) == sum(len(primes) for primes in iter_prime_segments(0, value + 1))
+
+
+def test_nth_prime():
+    testing.assert_equal([nth_prime(i) for i in range(1, 11)], first_n_primes(10))
+    assert nth_prime(1000) == 7919
+    assert nth_prime(10**6) == 15485863
+    assert nth_prime(10**7) == 179424673
+    assert nth_prime(50847534) == 999999937
+    try:
+        nth_prime(0)
+        raise AssertionError("there is no zeroth prime")
+    except ValueError:
+        pass
+
+
+def test_iter_primes():
+    # agrees with the sieve across several segments
+    primes = iter_primes()
+    observed = [next(primes) for _ in range(200_000)]
+    testing.assert_equal(np.array(observed), np.array(PRIMES[:200_000]))
+
+    # starting part way along
+    testing.assert_equal(list(islice(iter_primes(90), 5)), [97, 101, 103, 107, 109])
+    testing.assert_equal(next(iter_primes(10**10)), 10000000019)
+    testing.assert_equal(list(islice(iter_primes(0), 4)), [2, 3, 5, 7])
+
+    # resume from a checkpoint, with some primes pulled one at a time and some a chunk at a time
+    primes = iter_primes(1000)
+    first = [next(primes) for _ in range(10)]
+    first.extend(primes.next_chunk().tolist())
+    resumed = iter_primes(primes.checkpoint)
+    assert next(resumed) == next(primes) > first[-1]
+    testing.assert_equal(primes.next_chunk()[:100], resumed.next_chunk()[:100])
+    testing.assert_equal(first, primes_between(1000, first[-1] + 1))
+
+
+def test_factorization():
+    factored = factorize(2**3 * 3 * 7**2)
+    assert factored.primes == (2, 3, 7)
+    assert factored.exponents == (3, 1, 2)
+    assert int(factored) == 1176
+    assert list(factored) == [2, 2, 2, 3, 7, 7]
+    assert factored == Factorization.from_factors([7, 2, 3, 2, 7, 2])
+    assert repr(factored) == "Factorization(2^3 * 3 * 7^2)"
+    assert factorize(1) == Factorization() and int(Factorization()) == 1
+
+    # combining factorizations agrees with the integer versions
+    other = factorize(2 * 5**2 * 7**3)
+    assert int(factored.lcm(other)) == least_common_multiple(1176, 2 * 5**2 * 7**3)
+    assert int(factored.gcd(other)) == greatest_common_factor(1176, 2 * 5**2 * 7**3)
+    assert int(factored * other) == 1176 * 2 * 5**2 * 7**3
+    assert factored.gcd(factorize(11 * 13)) == Factorization()
+
+    # repeated values come from the cache
+    factorize.cache_clear()
+    value = 1000000007 * 998244353
+    assert factorize(value) is factorize(value)
+    info = factorize.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    assert info.maxsize == FACTORIZATION_CACHE_SIZE
+
+    # shared results cannot be changed
+    testing.assert_raises(AttributeError, setattr, factorize(value), "primes", (2,))
+    testing.assert_raises(AttributeError, delattr, factorize(value), "exponents")
+    assert factorize(value).primes == (998244353, 1000000007)
+    import pickle
+
+    assert pickle.loads(pickle.dumps(factored)) == factored
+
+
+def test_batch():
+    lines = ["12", "", "# a comment", "97, 1009"]
+    testing.assert_equal(list(process_batch(lines)), ["12\t2 2 3", "97\t97", "1009\t1009"])
+    testing.assert_equal(
+        list(process_batch(["12 18", "4,6,8 # comment"], operation="lcm")), ["12 18\t36", "4 6 8\t24"]
+    )
+    testing.assert_equal(
+        list(process_batch(["12 18", "4 6 8"], operation="gcf", output_format="jsonl")),
+        ['{"values": [12, 18], "gcf": 6}', '{"values": [4, 6, 8], "gcf": 2}'],
+    )
+    testing.assert_equal(list(process_batch(["1"], output_format="jsonl")), ['{"value": 1, "factors": []}'])
+
+    # bad input is reported in place and the rest of the stream carries on
+    testing.assert_equal(
+        list(process_batch(["12", "abc", "15 -12"])),
+        [
+            "12\t2 2 3",
+            "abc\t\tline 2: invalid literal for int() with base 10: 'abc'",
+            "15\t3 5",
+            "-12\t\tline 3: Cannot factor -12",
+        ],
+    )
+    errors = [json.loads(line) for line in process_batch(["1.5"] * (BATCH_LINES + 1), output_format="jsonl")]
+    assert errors[-1] == {
+        "line": BATCH_LINES + 1,
+        "input": "1.5",
+        "error": "invalid literal for int() with base 10: '1.5'",
+    }
+
+    # order is kept across groups and workers
+    lines = [str(value) for value in range(2, 3 * BATCH_LINES)]
+    expected = list(process_batch(lines))
+    assert len(expected) == len(lines)
+    testing.assert_equal(list(process_batch(iter(lines), workers=2)), expected)
+
+
+def test_is_prime_many_64bit():
+    rng = np.random.default_rng(42)
+    for low, high in ((2**20, 2**32), (2**32, 2**63), (2**63, 2**64 - 1)):
+        values = rng.integers(low, high, 2000, dtype=np.uint64, endpoint=True)
+        testing.assert_equal(is_prime_many(values), [is_probable_prime(value) for value in values.tolist()])
+
+    # largest 64-bit primes and strong pseudoprimes to several bases
+    values = np.array(
+        [2**64 - 59, 2**64 - 57, 2**63 - 25, 3215031751, 4759123141, 3825123056546413051, 1795265022 * 3 + 2],
+        dtype=np.uint64,
+    )
+    testing.assert_equal(is_prime_many(values), [True, False, True, False, False, False, is_prime(1795265022 * 3 + 2)])
+
+    # values too big for uint64 are tested one at a time
+    testing.assert_equal(is_prime_many(np.array([2**89 - 1, 2**89 + 1], dtype=object)), [True, False])
+
+
+def test_lcm_upto():
+    for number in (1, 2, 3, 10, 20, 97, 100, 1000):
+        assert lcm_upto(number) == least_common_multiple(*range(1, number + 1))
+    assert lcm_upto(20) == 232792560
+    assert lcm_upto(30_000) % lcm_upto(29_999) == 0
+
+    assert primorial(1) == 1
+    assert primorial(10) == 210
+    assert primorial(30) == 6469693230
+    assert _product_tree([]) == 1
+    assert _product_tree(range(1, 101)) == factorial(100)
+
+    assert legendre_exponent(100, 2) == 97
+    assert legendre_exponent(100, 5) == 24
+    assert legendre_exponent(3, 5) == 0
+    for prime in (1, 0, -2):
+        testing.assert_raises(ValueError, legendre_exponent, 10, prime)
+    testing.assert_raises(ValueError, legendre_exponent, -5, 2)
+    for number in (0, 1, 5, 30, 500):
+        assert int(factorial_factorization(number)) == factorial(number)
+    assert factorial_factorization(10) == factorize(factorial(10))
+
+
+def test_counters():
+    reset_counters()
+    factorize.cache_clear()
+    assert counters() == {"factorize_cache_hits": 0, "factorize_cache_misses": 0}
+
+    # nothing is counted until asked for
+    prime_factorization(2**40 + 15)
+    assert "trial_divisions" not in counters()
+
+    enable_counters()
+    try:
+        value = 1000003 * 999983 * 7
+        prime_factorization(value)
+        prime_factorization(value)
+        primes_between(0, 100_000)
+        observed = counters()
+    finally:
+        enable_counters(False)
+    assert observed["trial_divisions"] > 0
+    assert observed["pollard_rho_splits"] >= 1
+    assert observed["miller_rabin_tests"] >= 2
+    assert observed["sieve_segments"] >= 1
+    assert observed["factorize_cache_hits"] == 1
+    assert observed["factorize_cache_misses"] == 2
+
+
 def _check_abelian(function, a, b, expected):
     testing.assert_equal(function(a, b), expected)
     testing.assert_equal(function(a, b), function(b, a))
 
 
+def test_lcm_large():
+    # factors past the original prime table
+    _check_abelian(least_common_multiple, 1009, 1013, 1009 * 1013)
+    _check_abelian(greatest_common_factor, 1009 * 6, 1009 * 4, 1009 * 2)
+
+    values = list(range(1, 41))
+    expected = 5342931457063200
+    assert least_common_multiple(*values) == expected
+    assert lcm_iter(iter(values)) == expected
+    assert lcm_array(np.array(values)) == expected
+    assert lcm_array(np.arange(1, 101)) == least_common_multiple(*range(1, 101))  # promoted past int64
+    assert lcm_array(np.array([2**63, 3], dtype=np.uint64)) == 3 * 2**63
+    assert lcm_array(np.array([0, 3])) == 0
+
+    values = [2**20 * 3 * k for k in range(1, 10_000)]
+    assert greatest_common_factor(*values) == 2**20 * 3
+    assert gcf_iter(iter(values)) == 2**20 * 3
+    assert gcf_array(np.array(values)) == 2**20 * 3
+
+    # stops reading once the answer is one
+    def stream():
+        yield from (6, 35)
+        raise AssertionError("read past the point the answer was known")
+
+    assert gcf_iter(stream()) == 1
+
+
 def test_lcm():
     # a number with itself is itself
     for i in range(10):
@@ -211,12 +1666,64 @@ if __name__ == "__main__":
         type=int,
         help="number of primes to calculate (default=%(default)s)",
     )
+    parser.add_argument("--nth", action="store_true", help="only print the NUM-th prime, works for very large NUM")
+    parser.add_argument("--pi", type=int, help="print the number of primes less than or equal to PI")
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="read integers line by line from FILE (default=stdin) and stream the results to stdout",
+    )
+    parser.add_argument(
+        "--operation",
+        choices=BATCH_OPERATIONS,
+        default="factor",
+        help="what batch mode does with each line (default=%(default)s)",
+    )
+    parser.add_argument(
+        "--format", choices=BATCH_FORMATS, default="tsv", help="batch mode output format (default=%(default)s)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="processes used in batch mode, 0 for every core (default=%(default)s)"
+    )
     args = parser.parse_args()
 
     if args.test:
+        setup_module()
+        test_sieve()
+        test_prime_cache()
+        test_first_n_primes()
         test_prime_factorization()
+        test_large_factorization()
+        test_is_probable_prime()
+        test_pollard_rho()
+        test_factorize_many()
+        test_is_prime()
+        test_is_prime_many_64bit()
+        test_parallel_range()
+        test_prime_pi()
+        test_nth_prime()
+        test_iter_primes()
+        test_factorization()
         test_lcm()
+        test_lcm_large()
+        test_lcm_upto()
+        test_counters()
         test_gcf()
+        test_batch()
+        teardown_module()
         print("all tests passed")
+    elif args.batch is not None:
+        import sys
+
+        handle = sys.stdin if args.batch == "-" else open(args.batch, "r")
+        with handle:
+            for line in process_batch(handle, args.operation, args.format, args.workers):
+                sys.stdout.write(line + "\n")
+    elif args.pi is not None:
+        print(prime_pi(args.pi))
+    elif args.nth:
+        print(nth_prime(args.num))
     else:
         print(" ".join([str(i) for i in first_n_primes(args.num)]))
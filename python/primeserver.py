@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# Long running primes service over a unix domain socket, so short lived callers skip the interpreter
+# startup and table loading of primes.py. The protocol is one JSON object per line in each direction:
+#
+#   {"id": 1, "op": "factor", "args": [360]}  ->  {"id": 1, "result": [2, 2, 2, 3, 3, 5]}
+#
+# The client half only needs the standard library so that it starts quickly; primes (and numpy) are
+# only imported by the server.
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+SOCKET_PATH = os.environ.get("PRIMES_SOCKET", os.path.join(tempfile.gettempdir(), f"primes-{os.getuid()}.sock"))
+OPERATIONS = ("factor", "lcm", "gcf", "is_prime", "nth_prime")
+# bytes read from a connection at a time, every complete request in them is answered as one batch
+READ_SIZE = 1 << 16
+
+
+def _answer_batch(lines: List[bytes]) -> List[bytes]:
+    """Answer a group of request lines, with the primality checks done together"""
+    import primes
+
+    requests: List[Tuple[int, str, list]] = []
+    responses: Dict[int, dict] = {}
+    for position, line in enumerate(lines):
+        try:
+            request = json.loads(line)
+            operation, args = request["op"], request.get("args", [])
+            if operation not in OPERATIONS:
+                raise ValueError(f'Unknown operation "{operation}"')
+            if not isinstance(args, list) or not all(isinstance(arg, int) for arg in args) or not args:
+                raise ValueError("Arguments must be a non-empty list of integers")
+            requests.append((position, operation, args))
+            responses[position] = {"id": request.get("id")}
+        except (ValueError, KeyError, TypeError) as e:
+            responses[position] = {"id": None, "error": str(e)}
+
+    # batch every is_prime request that fits in 64 bits through the vectorized test
+    checks = [(position, args[0]) for position, operation, args in requests if operation == "is_prime"]
+    if checks and all(0 <= value < 1 << 64 for _, value in checks):
+        import numpy as np
+
+        answers = primes.is_prime_many(np.array([value for _, value in checks], dtype=np.uint64))
+        for (position, _), answer in zip(checks, answers.tolist()):
+            responses[position]["result"] = answer
+
+    result: Any
+    for position, operation, args in requests:
+        if "result" in responses[position]:
+            continue
+        try:
+            if operation == "factor":
+                result = primes.prime_factorization(args[0])
+            elif operation == "lcm":
+                result = primes.least_common_multiple(*args)
+            elif operation == "gcf":
+                result = primes.greatest_common_factor(*args)
+            elif operation == "is_prime":
+                result = primes.is_prime(args[0])
+            else:
+                result = primes.nth_prime(args[0])
+            responses[position]["result"] = result
+        except Exception as e:  # one bad request must not take down the rest of the batch
+            responses[position]["error"] = str(e)
+
+    return [json.dumps(responses[position]).encode() + b"\n" for position in range(len(lines))]
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    pending = b""
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            *lines, pending = (pending + data).split(b"\n")
+            lines = [line for line in lines if line.strip()]
+            if lines:
+                # answered off the event loop so a slow request does not hold up other connections
+                responses = await asyncio.get_running_loop().run_in_executor(None, _answer_batch, lines)
+                writer.writelines(responses)
+                await writer.drain()
+    finally:
+        writer.close()
+
+
+def warm_up() -> None:
+    """Load the prime tables so that the first requests do not pay for them"""
+    import primes
+
+    primes.PRIMES.extend_to(1 << 20)
+    primes.smallest_factor_table()
+
+
+async def serve(path: str = SOCKET_PATH, started: Optional[threading.Event] = None) -> None:
+    """Answer requests on the unix socket at ``path`` until cancelled"""
+    warm_up()
+    if os.path.exists(path):
+        os.remove(path)  # left behind by a server that did not shut down cleanly
+    server = await asyncio.start_unix_server(_handle, path=path)
+    if started is not None:
+        started.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class PrimeClient:
+    """Blocking client for the primes service. Requests can be pipelined with ``request_many``."""
+
+    def __init__(self, path: str = SOCKET_PATH):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._stream = self._socket.makefile("rwb")
+        self._next_id = 0
+
+    def request_many(self, requests: Iterable[Tuple[str, Sequence[int]]]) -> list:
+        """Send every ``(operation, args)`` before reading any answers, returns the results in order. Every
+        answer is read before the first error is raised so that the connection stays in step."""
+        ids = []
+        for operation, args in requests:
+            self._next_id += 1
+            ids.append(self._next_id)
+            self._stream.write(json.dumps({"id": self._next_id, "op": operation, "args": list(args)}).encode() + b"\n")
+        self._stream.flush()
+
+        responses = []
+        for _ in ids:
+            line = self._stream.readline()
+            if not line:
+                raise RuntimeError("Primes service closed the connection")
+            responses.append(json.loads(line))
+        for response in responses:
+            if "error" in response:
+                raise ValueError(response["error"])
+        results = {response["id"]: response["result"] for response in responses}
+        return [results[request_id] for request_id in ids]
+
+    def request(self, operation: str, *args: int):
+        return self.request_many([(operation, args)])[0]
+
+    def factor(self, value: int) -> List[int]:
+        return self.request("factor", value)
+
+    def lcm(self, *values: int) -> int:
+        return self.request("lcm", *values)
+
+    def gcf(self, *values: int) -> int:
+        return self.request("gcf", *values)
+
+    def is_prime(self, value: int) -> bool:
+        return self.request("is_prime", value)
+
+    def nth_prime(self, number: int) -> int:
+        return self.request("nth_prime", number)
+
+    def close(self) -> None:
+        self._stream.close()
+        self._socket.close()
+
+    def __enter__(self) -> "PrimeClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def test_service(tmp_path):
+    import pytest  # type: ignore
+
+    path = str(tmp_path / "primes.sock")
+    started = threading.Event()
+    threading.Thread(target=asyncio.run, args=(serve(path, started),), daemon=True).start()
+    assert started.wait(timeout=30)
+
+    with PrimeClient(path) as client:
+        assert client.factor(360) == [2, 2, 2, 3, 3, 5]
+        assert client.factor(2**64 + 1) == [274177, 67280421310721]
+        assert client.lcm(4, 6, 10) == 60
+        assert client.gcf(12, 18) == 6
+        assert client.is_prime(97) is True
+        assert client.is_prime(2**89 - 1) is True
+        assert client.nth_prime(1000) == 7919
+
+        # pipelined requests come back in order, with the primality checks batched
+        values = list(range(1000, 2000))
+        answers = client.request_many(("is_prime", [value]) for value in values)
+        import primes
+
+        assert answers == [primes.is_prime(value) for value in values]
+
+        with pytest.raises(ValueError):
+            client.request("unknown", 1)
+        with pytest.raises(ValueError):
+            client.lcm()
+        # the connection is still usable after an error
+        assert client.gcf(8, 12) == 4
+        # including one part way through a pipelined group
+        with pytest.raises(ValueError):
+            client.request_many([("gcf", [8, 12]), ("factor", [0]), ("lcm", [4, 6])])
+        assert client.lcm(3, 5) == 15
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="primes service over a unix domain socket")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="socket path (default=%(default)s)")
+    parser.add_argument("--serve", action="store_true", help="run the service in the foreground")
+    parser.add_argument("operation", nargs="?", choices=OPERATIONS, help="request to send to a running service")
+    parser.add_argument("args", nargs="*", type=int, help="integer arguments for the request")
+    options = parser.parse_args()
+
+    if options.serve:
+        try:
+            asyncio.run(serve(options.socket))
+        except KeyboardInterrupt:
+            pass
+    elif options.operation:
+        with PrimeClient(options.socket) as client:
+            result = client.request(options.operation, *options.args)
+        print(" ".join(str(item) for item in result) if isinstance(result, list) else result)
+    else:
+        parser.error("either --serve or an operation is required")
+    sys.exit(0)
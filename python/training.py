@@ -1,13 +1,9 @@
 #!/usr/bin/env python
 from __future__ import (absolute_import, division, print_function)
 from datetime import datetime, timedelta
+from icalwriter import ICalWriter
+from trainingobjs import BikePace, PaceProfile, RunPace, SwimPace
 from trainingplans import trainingplans
-try:
-    from icalendar import Calendar  # type: ignore
-    WITH_ICAL = True
-except ImportError:
-    print('Running without icalendar support')
-    WITH_ICAL = False
 
 DELTA_WEEK = timedelta(days=7)
 
@@ -46,6 +42,14 @@ if __name__ == '__main__':
     parser.add_argument('--start-date', type=valid_date,
                         help='start training after a certain date (default=today)',
                         default=datetime.today())
+    parser.add_argument('--run-pace', type=RunPace, default=RunPace(10.),
+                        help='running pace in minutes per mile, e.g. 9:30 (default=10:00)')
+    parser.add_argument('--swim-pace', type=float, default=3.,
+                        help='swimming pace in minutes per 100 yards (default=%(default)s)')
+    parser.add_argument('--bike-speed', type=float, default=15.,
+                        help='cycling speed in miles per hour (default=%(default)s)')
+    parser.add_argument('--transition', type=float, default=0.,
+                        help='minutes between workouts on the same day (default=%(default)s)')
     # TODO add option to set start time on weekdays
 
     # parse the command line
@@ -57,6 +61,7 @@ if __name__ == '__main__':
     if options.start_date > options.date:
         parser.error('Race is in the past. Look at --date')
     raceweek = getRaceWeek(options.date)
+    paces = PaceProfile(run=options.run_pace, swim=SwimPace(options.swim_pace), bike=BikePace(options.bike_speed))
 
     # create the training program
     training = trainingplans[options.racetype]
@@ -77,27 +82,20 @@ if __name__ == '__main__':
     if not len(training):
         raise RuntimeError("No training being generated")
 
-    ical = None if not WITH_ICAL else Calendar()
-
-    # print the results
+    # print the results while streaming the calendar to disk
+    FILENAME = 'training.ics'
     print(training[0].tableHeader())
-    for num, week in enumerate(training):
-        weeknum = len(training) - num
-        weekdate = raceweek - (weeknum - 1) * DELTA_WEEK
-
-        # this creates the calendar
-        if ical is not None:
-            for day in week.toICalGen(weeknum, weekdate, startweekday=(7, 30)):
-                if day is not None:
-                    ical.add_component(day)
-
-        # this prints the table version
-        print(week.tableRows(weekdate, weeknum))
-
-    # write the calendar to disk
-    if ical is not None:
-        # write to disk
-        FILENAME = 'training.ics'
-        with open(FILENAME, 'wb') as handle:
-            handle.write(ical.to_ical())
-        print('Wrote training calendar to "{}"'.format(FILENAME))
+    with open(FILENAME, 'wb') as handle, ICalWriter(handle) as calendar:
+        for num, week in enumerate(training):
+            weeknum = len(training) - num
+            weekdate = raceweek - (weeknum - 1) * DELTA_WEEK
+
+            # this creates the calendar
+            for event in week.toEventGen(weeknum, weekdate, startweekday=(7, 30), paces=paces,
+                                         transition=timedelta(minutes=options.transition)):
+                if event is not None:
+                    calendar.write(event)
+
+            # this prints the table version
+            print(week.tableRows(weekdate, weeknum, paces))
+    print('Wrote training calendar to "{}"'.format(FILENAME))
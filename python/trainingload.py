@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Training load from the intensity and duration of every workout in a plan. The stress of a session is its
+# session-RPE, the rate of perceived exertion times the minutes. Fitness (chronic training load, CTL) and
+# fatigue (acute training load, ATL) are exponentially weighted averages of the daily stress, form (training
+# stress balance, TSB) is their difference and ATL/CTL is the acute:chronic workload ratio.
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+import pytest  # type: ignore
+
+from trainingobjs import (
+    DAY_NAMES,
+    PaceProfile,
+    REST,
+    TrainingDay,
+    TrainingItem,
+    Week,
+    athleteMinutes,
+    planToArray,
+    plansToArray,
+)
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 42
+# acute:chronic ratios above this are associated with a jump in injury risk
+ACWR_RISK = 1.5
+
+TrainingLoad = namedtuple("TrainingLoad", ["stress", "atl", "ctl", "tsb", "acwr"])
+
+
+def dailyStress(array: np.ndarray, minutes: Optional[np.ndarray] = None) -> np.ndarray:
+    """Session-RPE summed over each day of planToArray or plansToArray, shape (..., day). ``minutes`` replaces
+    the durations at the default paces, such as the output of athleteMinutes."""
+    if minutes is None:
+        minutes = array["minutes"]
+    stress = (array["rpe"] * minutes).sum(axis=-1)  # (..., week, day)
+    return stress.reshape(stress.shape[:-2] + (-1,))
+
+
+def ewma(values: np.ndarray, days: float, initial=0.0) -> np.ndarray:
+    """Exponentially weighted average along the last axis with a time constant of ``days``"""
+    decay = np.exp(-1.0 / days)
+    result = np.empty(values.shape, dtype=np.float64)
+    current = np.broadcast_to(np.asarray(initial, dtype=np.float64), values.shape[:-1])
+    for day in range(values.shape[-1]):
+        current = current * decay + values[..., day] * (1.0 - decay)
+        result[..., day] = current
+    return result
+
+
+def baseline(stress: np.ndarray, days: int = ACUTE_DAYS) -> np.ndarray:
+    """Mean daily stress over the first ``days`` days from the first day of training, shape (...)"""
+    start = np.argmax(stress > 0.0, axis=-1)
+    index = start[..., None] + np.arange(days)
+    inside = index < stress.shape[-1]  # plans shorter than ``days`` average what there is
+    values = np.take_along_axis(stress, np.minimum(index, stress.shape[-1] - 1), axis=-1)
+    return np.where(inside, values, 0.0).sum(axis=-1) / inside.sum(axis=-1)
+
+
+def trainingLoad(
+    stress: np.ndarray, acute: float = ACUTE_DAYS, chronic: float = CHRONIC_DAYS, initial=None
+) -> TrainingLoad:
+    """ATL, CTL, TSB and the acute:chronic ratio for a daily stress series, or many of them stacked.
+
+    Starting both averages from zero would make every plan look like a spike, so the athlete is taken to be
+    training at ``initial`` daily stress (by default the baseline of the plan) up to the first day of training.
+    """
+    if initial is None:
+        initial = baseline(stress)
+    initial = np.asarray(initial, dtype=np.float64)
+    started = np.arange(stress.shape[-1]) >= np.argmax(stress > 0.0, axis=-1)[..., None]
+    filled = np.where(started, stress, initial[..., None])
+
+    atl = ewma(filled, acute, initial)
+    ctl = ewma(filled, chronic, initial)
+    acwr = np.full(ctl.shape, np.nan)
+    np.divide(atl, ctl, out=acwr, where=ctl > 0.0)
+    return TrainingLoad(stress=stress, atl=atl, ctl=ctl, tsb=ctl - atl, acwr=acwr)
+
+
+def planLoad(training, paces: Optional[PaceProfile] = None, **kwargs) -> TrainingLoad:
+    """Training load of a single plan, one entry per day"""
+    array = planToArray(training)
+    minutes = None if paces is None else athleteMinutes(array, [paces])[0]
+    return trainingLoad(dailyStress(array, minutes), **kwargs)
+
+
+def plansLoad(plans, **kwargs) -> TrainingLoad:
+    """Training load of many plans at once, shape (plan, day). Plans are aligned on their last week."""
+    return trainingLoad(dailyStress(plansToArray(plans)), **kwargs)
+
+
+def riskyDays(load: TrainingLoad, threshold: float = ACWR_RISK) -> np.ndarray:
+    """Days where the acute:chronic ratio spikes above ``threshold``"""
+    return np.nan_to_num(load.acwr) > threshold
+
+
+def test_stress():
+    tempo = TrainingItem("Run 30 min", "Tempo RPE 7")
+    easy = TrainingItem("Run 5 miles", "Easy RPE 4")  # 50 minutes
+    week = Week(REST, tempo, TrainingDay(tempo, easy), REST, easy, REST, REST)
+    stress = dailyStress(planToArray([week, week]))
+    assert stress.shape == (2 * len(DAY_NAMES),)
+    assert stress[: len(DAY_NAMES)].tolist() == [0.0, 210.0, 410.0, 0.0, 200.0, 0.0, 0.0]
+
+    faster = PaceProfile(run=8.0)
+    minutes = athleteMinutes(planToArray([week]), [faster])[0]
+    assert dailyStress(planToArray([week]), minutes).tolist() == [0.0, 210.0, 370.0, 0.0, 160.0, 0.0, 0.0]
+    assert planLoad([week], paces=faster).stress.tolist() == [0.0, 210.0, 370.0, 0.0, 160.0, 0.0, 0.0]
+
+
+def test_ewma():
+    values = np.ones((3, 200))
+    values[1] *= 2.0
+    result = ewma(values, 7)
+    assert result.shape == values.shape
+    assert result[0, 0] == pytest.approx(1.0 - np.exp(-1.0 / 7))
+    assert result[0, -1] == pytest.approx(1.0)  # converges on a steady load
+    np.testing.assert_allclose(result[1], 2.0 * result[0])
+    np.testing.assert_allclose(ewma(values, 7, initial=[1.0, 2.0, 1.0]), values)
+
+
+def test_baseline():
+    stress = np.array([[0.0, 0.0, 1.0, 2.0, 3.0, 4.0], [5.0, 0.0, 1.0, 0.0, 0.0, 0.0]])
+    np.testing.assert_allclose(baseline(stress, days=2), [1.5, 2.5])
+    np.testing.assert_allclose(baseline(stress, days=5), [2.5, 1.2])  # runs off the end
+
+
+def test_training_load():
+    steady = Week(*[TrainingItem("Run 60 min", "Easy RPE 4")] * len(DAY_NAMES))
+    rest = Week(*[REST] * len(DAY_NAMES))
+    spike = Week(*[TrainingItem("Run 120 min", "Tempo RPE 8")] * len(DAY_NAMES))
+
+    load = plansLoad([[steady] * 12, [steady] * 10 + [spike, rest], [steady] * 6])
+    assert load.stress.shape == load.atl.shape == load.acwr.shape == (3, 12 * len(DAY_NAMES))
+    np.testing.assert_allclose(load.tsb, load.ctl - load.atl)
+    # a steady plan is steady from the start, even when it starts later than the others
+    np.testing.assert_allclose(load.acwr[0], 1.0)
+    np.testing.assert_allclose(load.acwr[2], 1.0)
+
+    risky = riskyDays(load)
+    assert not risky[0].any()
+    assert risky[1, 10 * len(DAY_NAMES) :].any()
+    assert not risky[2].any()
+    # resting the final week sheds fatigue
+    assert load.tsb[1, -1] > load.tsb[1, 11 * len(DAY_NAMES) - 1]
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(pytest.main([__file__]))
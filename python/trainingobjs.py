@@ -2,9 +2,13 @@
 from __future__ import absolute_import, division, print_function
 from copy import deepcopy
 from datetime import date, datetime, time, timedelta
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 import numpy as np
 import pytest  # type: ignore
 
+from icalwriter import CalendarEvent
+
 try:
     from icalendar import Alarm, Event  # type: ignore
 
@@ -14,8 +18,13 @@ except ImportError:
     WITH_ICAL = False
 
 DAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+DAY_ATTRS = tuple(name.lower() for name in DAY_NAMES)
 DELTA_WEEK = timedelta(days=7)
 KM_PER_MILE = 1.609344
+START_WEEKDAY = (7, 30)
+START_WEEKEND = (8, 0)
+TRANSITION = timedelta(minutes=0)  # time between the items of a day
+ALARM = timedelta(minutes=-15)  # reminder before the first workout of a weekday
 YARD_PER_MILE = 1760
 
 
@@ -58,13 +67,257 @@ SPEED_SWIM = SwimPace(3.0)  # 1 minutes per 100 yard
 SPEED_BIKE = BikePace(15.0)  # 15 mph
 
 
-class TrainingItem:
-    def __init__(self, summary: str, description: str = ""):
-        self.summary = summary
-        if description:
-            self.description = description
+class Workout(NamedTuple):
+    """A training item summary parsed into the pieces needed to know how long it takes"""
+
+    sport: str  # one of SPORTS
+    kind: str  # one of WORKOUT_KINDS, taken from the description
+    rpe: float  # rate of perceived exertion, 0-10, from the description or guessed from the kind
+    distance: float  # in miles, zero when the summary gives a duration
+    duration: Optional[timedelta]  # explicit duration from the summary
+    raw: timedelta  # time at the default paces
+    rounded: timedelta  # raw rounded up to the nearest half hour, with a minimum of an hour
+
+
+SPORTS = ("rest", "run", "swim", "bike", "cross", "other")
+SPEEDS = {"run": SPEED_RUN, "swim": SPEED_SWIM, "bike": SPEED_BIKE}
+WORKOUT_KINDS = ("", "easy", "moderate", "tempo", "long", "speed")
+KIND_RPE = {"": 5.0, "easy": 4.0, "moderate": 6.0, "tempo": 7.0, "long": 6.0, "speed": 8.0}
+RPE_PATTERN = re.compile(r"RPE\s*(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?")
+
+# columnar form of a plan, indexed by (week, day, slot). Unused slots have a sport of EMPTY_SLOT.
+PLAN_DTYPE = np.dtype(
+    [
+        ("sport", np.int8),  # index into SPORTS
+        ("kind", np.int8),  # index into WORKOUT_KINDS
+        ("timed", np.bool_),  # duration is given rather than a distance
+        ("distance", np.float64),  # miles
+        ("minutes", np.float64),  # same as volume()
+        ("rounded", np.float64),  # same as toTimeDelta()
+        ("rpe", np.float64),  # intensity
+        ("width", np.int16),  # same as width()
+    ]
+)
+EMPTY_SLOT = -1
+
+
+def _toSport(summary: str) -> str:
+    description = summary.lower()
+    if "run" in description or "marathon" in description or "km race" in description:
+        return "run"
+    elif "swim" in description:
+        return "swim"
+    elif "bike" in description:
+        return "bike"
+    elif "cross" in description:
+        return "cross"
+    return "other"
+
+
+def _toDistanceInMiles(summary: str) -> float:
+    """Convert description to distance in miles"""
+
+    def toFloat(text: str) -> float:
+        replaced_text = text.lower().replace("run", "").replace("swim", "").replace("bike", "")
+        for item in replaced_text.split():
+            return float(item)
+        raise ValueError('failed to convert "{}" to float'.format(text))
+
+    description = summary.lower()
+    if description.startswith("half"):
+        distance = 13.1
+    elif description == "marathon":
+        distance = 26.2
+    elif "km" in description:
+        # this only appears to be a running event
+        distance = toFloat(description) / KM_PER_MILE
+    elif "swim" in description:
+        if " m" in description:
+            distance = toFloat(description) * 0.001 / KM_PER_MILE
         else:
-            self.description = str(summary)  # copy the summary
+            raise ValueError(f'Do not know how to convert "{description}" to miles')
+    elif "metric century" in description:
+        distance = 62.0
+    elif "century" in description:
+        distance = 100.0
+    else:
+        distance = toFloat(description)
+
+    return distance
+
+
+def _toDuration(summary: str) -> Optional[timedelta]:
+    """The duration written in the summary, if there is one"""
+    if "min" in summary:
+        descr = summary[: summary.index("min")].strip()
+        descr = descr.split(" ")[-1]
+        return timedelta(hours=0, minutes=int(descr))
+    elif "hour" in summary:
+        descr = summary[: summary.index("hour")].strip()
+        descr = descr.split(" ")[-1]
+        return timedelta(hours=int(descr), minutes=0)
+    elif "hr" in summary:
+        descr = summary[: summary.index("hr")].strip()
+        descr = descr.split(" ")[-1]
+        return timedelta(hours=float(descr), minutes=0)
+    elif "cross" in summary.lower():
+        return timedelta(hours=0, minutes=30)
+    return None
+
+
+def _toKind(description: str) -> str:
+    """The type of workout is the first word of descriptions like "Tempo RPE 7" """
+    words = description.lower().split()
+    if words and words[0] in WORKOUT_KINDS:
+        return words[0]
+    return ""
+
+
+def _toRpe(description: str, kind: str) -> float:
+    """Intensity written like "Tempo RPE 7", a range like "RPE 6-7" is the middle of it"""
+    match = RPE_PATTERN.search(description)
+    if match is None:
+        return KIND_RPE[kind]
+    low, high = match.groups()
+    return (float(low) + float(high or low)) / 2.0
+
+
+def _roundUp(minutes: float) -> timedelta:
+    """Round up to the nearest half hour, with a minimum of an hour"""
+    hours = max(int(minutes) // int(60), 1)
+    minutes = max(0.0, minutes - hours * 60.0)
+    if minutes != 0.0 and minutes != 30.0:
+        # round up to the nearest half hour
+        if minutes > 30.0:
+            hours += 1
+            minutes = 0.0
+        elif minutes > 0.0:
+            minutes = 30.0
+    return timedelta(hours=hours, minutes=int(minutes))
+
+
+def _roundUpMinutes(minutes: np.ndarray) -> np.ndarray:
+    """Vectorized version of _roundUp that works in minutes"""
+    hours = np.maximum(np.floor(minutes) // 60, 1)
+    remainder = np.maximum(0.0, minutes - hours * 60.0)
+    return hours * 60.0 + np.where(remainder > 30.0, 60.0, np.where(remainder > 0.0, 30.0, 0.0))
+
+
+class PaceProfile:
+    """The paces of a single athlete. ``kinds`` overrides the pace for a (sport, kind) pair, such as
+    ``{("run", "long"): RunPace("10:30")}``"""
+
+    def __init__(self, run: Pace = SPEED_RUN, swim: Pace = SPEED_SWIM, bike: Pace = SPEED_BIKE, kinds=None):
+        # minutes per mile by sport, or by (sport, kind) for the overrides
+        self.paces: Dict[Union[str, Tuple[str, str]], float] = {
+            "run": float(run),
+            "swim": float(swim),
+            "bike": float(bike),
+        }
+        for (sport, kind), pace in (kinds or {}).items():
+            if sport not in SPEEDS or kind not in WORKOUT_KINDS:
+                raise ValueError(f'Cannot set a pace for "{kind}" {sport}')
+            self.paces[(sport, kind)] = float(pace)
+
+    def pace(self, sport: str, kind: str = "") -> float:
+        """Minutes per mile"""
+        if (sport, kind) in self.paces:
+            return self.paces[(sport, kind)]
+        try:
+            return self.paces[sport]
+        except KeyError as e:
+            raise RuntimeError(f'Do not have speed for activity "{sport}"') from e
+
+    def toArray(self) -> np.ndarray:
+        """Minutes per mile indexed by (sport, kind), zero for sports that are only timed"""
+        paces = np.zeros((len(SPORTS), len(WORKOUT_KINDS)))
+        for i, sport in enumerate(SPORTS):
+            if sport in SPEEDS:
+                paces[i] = [self.pace(sport, kind) for kind in WORKOUT_KINDS]
+        return paces
+
+
+DEFAULT_PACES = PaceProfile()
+
+
+def parseWorkout(summary: str, description: str = "") -> Workout:
+    """Parse a summary such as "Run 5 miles" or "Bike 60 min". This raises an exception if the duration
+    cannot be determined."""
+    kind = _toKind(description)
+    # first try simple static values
+    if "Rest" == summary or "-" == summary.strip() or "RACE DAY" == summary:
+        zero = timedelta(hours=0, minutes=0)
+        return Workout("rest", kind, 0.0, 0.0, zero, zero, zero)
+    rpe = _toRpe(description, kind)
+    duration = _toDuration(summary)
+    if duration is not None:
+        return Workout(_toSport(summary), kind, rpe, 0.0, duration, duration, duration)
+
+    # convert the input into something useful
+    sport = _toSport(summary)
+    if sport not in SPEEDS:
+        msg = 'Do not have speed for activity "{}"'.format(summary.lower())
+        raise RuntimeError(msg)
+    distance = _toDistanceInMiles(summary)
+    minutes = distance * DEFAULT_PACES.pace(sport, kind)
+    return Workout(sport, kind, rpe, distance, None, timedelta(hours=0, minutes=int(minutes)), _roundUp(minutes))
+
+
+class _Immutable:
+    """Training objects are shared between plans, so they cannot be changed after they are created"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class TrainingItem(_Immutable):
+    """A single workout. Items are interned, so creating the same (summary, description) twice returns the
+    same object."""
+
+    __slots__ = ("summary", "description", "key", "workout", "_error")
+    summary: str
+    description: str
+    key: tuple  # normalized ((summary, description),) used for comparing and hashing
+    workout: Optional[Workout]
+    _error: Optional[Exception]
+
+    _interned: Dict[Tuple[str, str], "TrainingItem"] = {}
+
+    def __new__(cls, summary: str, description: str = ""):
+        if not description:
+            description = str(summary)  # copy the summary
+        key = (summary, description)
+        item = cls._interned.get(key)
+        if item is not None:
+            return item
+
+        item = super().__new__(cls)
+        object.__setattr__(item, "summary", summary)
+        object.__setattr__(item, "description", description)
+        object.__setattr__(item, "key", ((summary.strip(), description.strip()),))
+        # parse the summary once, errors are held until the timing is asked for
+        try:
+            object.__setattr__(item, "workout", parseWorkout(summary, description))
+            object.__setattr__(item, "_error", None)
+        except (RuntimeError, ValueError) as e:
+            object.__setattr__(item, "workout", None)
+            object.__setattr__(item, "_error", e)
+        cls._interned[key] = item
+        return item
+
+    def __reduce__(self):
+        return (TrainingItem, (self.summary, self.description))
 
     def __str__(self):
         return self.summary
@@ -76,23 +329,15 @@ class TrainingItem:
         return 1
 
     def __eq__(self, other):
-        # check the summaries
-        try:
-            if self.summary.strip() != other.summary.strip():
-                return False
-        except AttributeError:
-            if self.summary.strip() != str(other).strip():
-                return False
-        # check the descriptions
-        try:
-            if self.description.strip() != other.description.strip():
-                return False
-        except AttributeError:
-            if self.description.strip() != str(other).strip():
-                return False
+        if self is other:
+            return True
+        if isinstance(other, (TrainingItem, TrainingDay)):
+            return self.key == other.key
+        # plain text is not compared, compare with TrainingItem(text) instead
+        return NotImplemented
 
-        # they must be the same if it got here
-        return True
+    def __hash__(self):
+        return hash(self.key)
 
     def __iter__(self):
         return iter([self])
@@ -126,210 +371,200 @@ class TrainingItem:
         """The width of the summary in characters. This is intended for use in printing to the console"""
         return max(len(self.summary.strip()), minimum)
 
-    def __speedInMinutes(self) -> float:
-        """generate speed in minutes per mile"""
-        description = self.summary.lower()
-
-        speed: Pace  # speed will end up being a pace object
-        if "run" in description or "marathon" in description or "km race" in description:
-            speed = SPEED_RUN
-        elif "swim" in description:
-            speed = SPEED_SWIM  # 3 minutes per 100 yards
-        elif "bike" in description:
-            speed = SPEED_BIKE  # 15 mph
-        else:
-            msg = 'Do not have speed for activity "{}"'.format(description)
-            raise RuntimeError(msg)
-
-        return float(speed)
-
-    def __toDistanceInMiles(self) -> float:
-        """Convert description to distance in miles"""
-
-        def toFloat(text: str) -> float:
-            replaced_text = text.lower().replace("run", "").replace("swim", "").replace("bike", "")
-            for item in replaced_text.split():
-                return float(item)
-            raise ValueError('failed to convert "{}" to float'.format(text))
-
-        description = self.summary.lower()
-        if description.startswith("half"):
-            distance = 13.1
-        elif description == "marathon":
-            distance = 26.2
-        elif "km" in description:
-            # this only appears to be a running event
-            distance = toFloat(description) / KM_PER_MILE
-        elif "swim" in description:
-            if " m" in description:
-                distance = toFloat(description) * 0.001 / KM_PER_MILE
-            else:
-                raise ValueError(f'Do not know how to convert "{description}" to miles')
-        elif "metric century" in description:
-            distance = 62.0
-        elif "century" in description:
-            distance = 100.0
-        else:
-            distance = toFloat(description)
-
-        return distance
-
-    def toTimeDelta(self, roundUp: bool = True) -> timedelta:
-        # first try simple static values
-        if "Rest" == self.summary or "-" == self.summary.strip() or "RACE DAY" == self.summary:
-            return timedelta(hours=0, minutes=0)
-        elif "min" in self.summary:
-            descr = self.summary[: self.summary.index("min")].strip()
-            descr = descr.split(" ")[-1]
-            return timedelta(hours=0, minutes=int(descr))
-        elif "hour" in self.summary:
-            descr = self.summary[: self.summary.index("hour")].strip()
-            descr = descr.split(" ")[-1]
-            return timedelta(hours=int(descr), minutes=0)
-        elif "hr" in self.summary:
-            descr = self.summary[: self.summary.index("hr")].strip()
-            descr = descr.split(" ")[-1]
-            return timedelta(hours=float(descr), minutes=0)
-        elif "cross" in self.summary.lower():
-            return timedelta(hours=0, minutes=30)
-
-        # convert the input into something useful
-        speed = self.__speedInMinutes()
-        distance = self.__toDistanceInMiles()
-
-        hours = 0
-        minutes = distance * speed
-        # print('{} x {} = 0h{}m'.format(distance, int(speed), int(minutes)))
-
-        if roundUp:
-            hours = max(int(minutes) // int(60), 1)
-            minutes = max(0.0, minutes - hours * 60.0)
-            if minutes != 0.0 and minutes != 30.0:
-                # print('         = {}h{}m'.format(hours, int(minutes)))
-                # round up to the nearest half hour
-                if minutes > 30.0:
-                    hours += 1
-                    minutes = 0.0
-                elif minutes > 0.0:
-                    minutes = 30.0
-            # print('         = {}h{}m'.format(hours, int(minutes)))
-
-        return timedelta(hours=hours, minutes=int(minutes))
-
-    def volume(self) -> timedelta:
-        return self.toTimeDelta(roundUp=False)
+    def toTimeDelta(self, roundUp: bool = True, paces: Optional[PaceProfile] = None) -> timedelta:
+        workout = self.workout
+        if workout is None:
+            raise type(self._error)(*self._error.args)  # type: ignore
+        if paces is None or paces is DEFAULT_PACES or workout.duration is not None:
+            return workout.rounded if roundUp else workout.raw
+
+        minutes = workout.distance * paces.pace(workout.sport, workout.kind)
+        return _roundUp(minutes) if roundUp else timedelta(hours=0, minutes=int(minutes))
+
+    def volume(self, paces: Optional[PaceProfile] = None) -> timedelta:
+        return self.toTimeDelta(roundUp=False, paces=paces)
+
+    def toRecord(self) -> tuple:
+        """This item as a row of PLAN_DTYPE"""
+        workout = self.workout
+        minutes = self.volume() / timedelta(minutes=1)  # raises the parse error if there is no workout
+        assert workout is not None
+        rounded = self.toTimeDelta() / timedelta(minutes=1)
+        return (
+            SPORTS.index(workout.sport),
+            WORKOUT_KINDS.index(workout.kind),
+            workout.duration is not None,
+            workout.distance,
+            minutes,
+            rounded,
+            workout.rpe,
+            self.width(),
+        )
 
     def shouldConvertToICal(self) -> bool:
-        descr = str(self).strip()  # be smarter than this
-        return descr != REST and descr != RACE
-
-    def toICalEvents(self, startdate, dayofweek: int, weeknum: int = 0):
-        if not WITH_ICAL:
-            raise RuntimeError("Not configured with icalnedar support")
-
-        startweekday = (7, 30)
-        startweekend = (8, 0)
-
-        event = Event()
-        # add in summary and description
+        summary = self.key[0][0]  # only the summary decides, whatever the description says
+        return summary != REST.key[0][0] and summary != RACE.key[0][0]
+
+    def toCalendarEvent(
+        self, startdate, dayofweek: int, weeknum: int = 0, paces: Optional[PaceProfile] = None, **kwargs
+    ) -> CalendarEvent:
+        return _scheduleDay([self], startdate, dayofweek, weeknum, paces, **kwargs)[0]
+
+    def toCalendarEvents(
+        self, startdate, dayofweek: int, weeknum: int = 0, paces: Optional[PaceProfile] = None, **kwargs
+    ) -> List[CalendarEvent]:
+        return [self.toCalendarEvent(startdate, dayofweek, weeknum, paces, **kwargs)]
+
+    def toICalEvents(self, startdate, dayofweek: int, weeknum: int = 0, paces: Optional[PaceProfile] = None):
+        return _toICal(self.toCalendarEvent(startdate, dayofweek, weeknum, paces))
+
+
+def _scheduleDay(
+    items,
+    startdate,
+    dayofweek: int,
+    weeknum: int = 0,
+    paces: Optional[PaceProfile] = None,
+    startweekday=START_WEEKDAY,
+    startweekend=START_WEEKEND,
+    transition: timedelta = TRANSITION,
+) -> List[CalendarEvent]:
+    """Lay the items of a day out back to back, with ``transition`` between them. Each item starts when the
+    previous one finishes by its actual duration. Only the last item ends at its rounded duration, so a day
+    blocks out the same rounded time as a single workout does."""
+    start = startdate + timedelta(days=dayofweek)
+    if dayofweek < 5:  # weekday
+        start = datetime.combine(start, time(*startweekday))
+    else:  # weekend
+        start = datetime.combine(start, time(*startweekend))
+
+    events: List[CalendarEvent] = []
+    for position, item in enumerate(items):
         if dayofweek == 0:
-            event.add("summary", "Week {} - {}".format(weeknum, self.summary))
+            summary = "Week {} - {}".format(weeknum, item.summary)
         else:
-            event.add("summary", self.summary)
-        event.add("description", self.description)
-
-        # add in the start
-        start = startdate + timedelta(days=dayofweek)
-        if dayofweek < 5:  # weekday
-            start = datetime.combine(start, time(*startweekday))
-        else:  # weekend
-            start = datetime.combine(start, time(*startweekend))
-        event.add("dtstart", start)
-
-        # add the end
-        delta = self.toTimeDelta()
-        if delta is not None:
-            event.add("dtend", start + delta)
-
-        # add the alarm
-        if delta is not None and dayofweek < 5:  # weekday
-            alarm = Alarm()
-            alarm.add("ACTION", "DISPLAY")
-            alarm.add("DESCRIPTION", "REMINDER")
-            alarm.add("TRIGGER", timedelta(minutes=-15))
-            event.add_component(alarm)
-
-        return event
+            summary = item.summary
+        # only remind about the first workout of a weekday
+        alarm = ALARM if dayofweek < 5 and not events else None
+        actual = item.volume(paces)
+        end = start + (item.toTimeDelta(paces=paces) if position == len(items) - 1 else actual)
+        events.append(CalendarEvent(summary, item.description, start, end, alarm))
+        start += actual + transition
+    return events
+
+
+def _toICal(calendarEvent: CalendarEvent):
+    """Convert to an icalendar Event"""
+    if not WITH_ICAL:
+        raise RuntimeError("Not configured with icalnedar support")
+
+    event = Event()
+    event.add("summary", calendarEvent.summary)
+    event.add("description", calendarEvent.description)
+    event.add("dtstart", calendarEvent.start)
+    if calendarEvent.end is not None:
+        event.add("dtend", calendarEvent.end)
+    if calendarEvent.alarm is not None:
+        alarm = Alarm()
+        alarm.add("ACTION", "DISPLAY")
+        alarm.add("DESCRIPTION", "REMINDER")
+        alarm.add("TRIGGER", calendarEvent.alarm)
+        event.add_component(alarm)
+    return event
 
 
 REST = TrainingItem(" - ")
 RACE = TrainingItem("RACE DAY")
 
 
-class TrainingDay:
+class TrainingDay(_Immutable):
+    """Several workouts on the same day. A day holding a single item compares and hashes equal to the item."""
+
+    __slots__ = ("_items", "key")
+    _items: tuple
+    key: tuple  # normalized (summary, description) of every item in order
+
     def __init__(self, *args):
-        self.__items = []
+        items = []
         for item in args:
-            self.__items.extend(item)
+            items.extend(item)
+        object.__setattr__(self, "_items", tuple(items))
+        object.__setattr__(self, "key", tuple(pair for item in items for pair in item.key))
+
+    def __reduce__(self):
+        return (TrainingDay, self._items)
 
     def __str__(self):
-        return " ".join([str(item) for item in self.__items])
+        return " ".join([str(item) for item in self._items])
 
     def __repr__(self):
         return str(self)
 
     def __len__(self):
-        return len(self.__items)
+        return len(self._items)
 
     def __eq__(self, other):
-        if len(self) != len(other):
-            return False
-        else:
-            pass  # TODO compare items
-        return True  # TODO this is wrong
+        if self is other:
+            return True
+        if isinstance(other, (TrainingItem, TrainingDay)):
+            return self.key == other.key
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.key)
 
     def __iter__(self):
-        return iter(self.__items)
+        return iter(self._items)
 
     def __add__(self, other) -> "TrainingDay":
-        day = deepcopy(self.__items)
-        if other != REST:
-            if isinstance(other, TrainingItem):
-                day.append(other)
-            elif isinstance(other, TrainingDay):
-                day.extend(other)
-            else:
-                raise ValueError(f'Cannot add "{other}"')
-
-        return TrainingDay(day)
-
-    def volume(self) -> timedelta:
+        # the items are immutable, so the new day shares them rather than copying
+        if other == REST:
+            return self
+        if not isinstance(other, (TrainingItem, TrainingDay)):
+            raise ValueError(f'Cannot add "{other}"')
+        return TrainingDay._fromItems(self._items + tuple(other), self.key + other.key)
+
+    @classmethod
+    def _fromItems(cls, items: tuple, key: tuple) -> "TrainingDay":
+        """Create a day from items that are already in a tuple along with their combined key"""
+        day = object.__new__(cls)
+        object.__setattr__(day, "_items", items)
+        object.__setattr__(day, "key", key)
+        return day
+
+    def volume(self, paces: Optional[PaceProfile] = None) -> timedelta:
         total = timedelta(hours=0, minutes=0)
-        for item in self.__items:
-            total += item.volume()
+        for item in self._items:
+            total += item.volume(paces)
 
         return total
 
     def shouldConvertToICal(self):
-        for item in self.__items:
+        for item in self._items:
             if item.shouldConvertToICal():
                 return True
         return False  # none of these should be ical
 
-    def toICalEvents(self, startdate, dayofweek: int, weeknum: int = 0):
-        if not WITH_ICAL:
-            raise RuntimeError("Not configured with icalnedar support")
-        raise NotImplementedError("like it says")  # TODO
+    def toCalendarEvents(
+        self, startdate, dayofweek: int, weeknum: int = 0, paces: Optional[PaceProfile] = None, **kwargs
+    ) -> List[CalendarEvent]:
+        """Events for the items of the day, back to back. Keyword arguments are startweekday, startweekend and
+        transition."""
+        items = [item for item in self._items if item.shouldConvertToICal()]
+        return _scheduleDay(items, startdate, dayofweek, weeknum, paces, **kwargs)
+
+    def toICalEvents(self, startdate, dayofweek: int, weeknum: int = 0, paces: Optional[PaceProfile] = None, **kwargs):
+        return [_toICal(event) for event in self.toCalendarEvents(startdate, dayofweek, weeknum, paces, **kwargs)]
 
     def itemInRow(self, rowNum: int):
         if rowNum >= len(self):
             return ""
         else:
-            return self.__items[rowNum]
+            return self._items[rowNum]
 
     def width(self, minimum: int = 3) -> int:
         width: int = minimum
-        for item in self.__items:
+        for item in self._items:
             width = max(width, item.width())
         return width
 
@@ -372,40 +607,106 @@ def toFiveDays(training):
     return adjusted
 
 
-class Week:
-    def __init__(self, mon, tue, wed, thu, fri, sat, sun):
-        self.mon = mon
-        self.tue = tue
-        self.wed = wed
-        self.thu = thu
-        self.fri = fri
-        self.sat = sat
-        self.sun = sun
-        self._lengths = None
+class Week(_Immutable):
+    __slots__ = ("mon", "tue", "wed", "thu", "fri", "sat", "sun", "key", "_lengths", "_array")
+    # the days are set by name in __init__, each is a TrainingItem or TrainingDay
+    mon: Any
+    tue: Any
+    wed: Any
+    thu: Any
+    fri: Any
+    sat: Any
+    sun: Any
+    key: tuple  # the key of every day, the table widths do not take part in comparisons
+    _lengths: Optional[tuple]
+    _array: Optional[np.ndarray]  # cached toArray()
+
+    def __init__(self, mon, tue, wed, thu, fri, sat, sun, lengths=None):
+        days = (mon, tue, wed, thu, fri, sat, sun)
+        for name, day in zip(DAY_ATTRS, days):
+            object.__setattr__(self, name, day)
+        object.__setattr__(self, "key", tuple(day.key for day in days))
+        object.__setattr__(self, "_lengths", None if lengths is None else tuple(lengths))
+        object.__setattr__(self, "_array", None)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, Week):
+            return self.key == other.key
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __reduce__(self):
+        return (Week, (*self, self._lengths))
 
     def __iter__(self):
         return iter([self.mon, self.tue, self.wed, self.thu, self.fri, self.sat, self.sun])
 
-    def setTableLengths(self, lengths):
+    def withTableLengths(self, lengths) -> "Week":
+        """A copy of this week that prints its table with the supplied column widths"""
         if len(lengths) != len(DAY_NAMES):
             raise RuntimeError("Wrong number of lengths {} != {}".format(len(lengths), len(DAY_NAMES)))
-        self._lengths = deepcopy(lengths)
-
-    def volume(self) -> timedelta:
-        total = timedelta(hours=0, minutes=0)
-        for item in self:
-            total += item.volume()
-        return total
-
-    def toICalGen(self, weeknum, weekdate, startweekday=(11, 30), startweekend=(8, 0)):
+        return Week(self.mon, self.tue, self.wed, self.thu, self.fri, self.sat, self.sun, lengths=lengths)
+
+    def toArray(self) -> np.ndarray:
+        """The week as a read-only PLAN_DTYPE array of shape (day, slot), built the first time it is asked for"""
+        array = self._array
+        if array is None:
+            array = _emptyPlanArray((len(DAY_NAMES), max(len(day) for day in self)))
+            for i, day in enumerate(self):
+                for j, item in enumerate(day):
+                    array[i, j] = item.toRecord()
+            array.flags.writeable = False
+            object.__setattr__(self, "_array", array)
+        return array
+
+    def volume(self, paces: Optional[PaceProfile] = None) -> timedelta:
+        if paces is None:
+            minutes = self.toArray()["minutes"]
+        else:
+            minutes = athleteMinutes(self.toArray(), [paces])[0]
+        return timedelta(minutes=float(minutes.sum()))
+
+    def toEventGen(
+        self,
+        weeknum,
+        weekdate,
+        startweekday=START_WEEKDAY,
+        startweekend=START_WEEKEND,
+        paces=None,
+        transition=TRANSITION,
+    ):
+        """Yields a CalendarEvent for every item, or None for days without any"""
         startdate = date(weekdate.year, weekdate.month, weekdate.day)
         for dayofweek, day in enumerate(self):
             if day != REST and day.shouldConvertToICal():
-                for item in day:  # loop through each item in the object
-                    yield item.toICalEvents(weeknum=weeknum, startdate=startdate, dayofweek=dayofweek)
+                yield from day.toCalendarEvents(
+                    startdate,
+                    dayofweek,
+                    weeknum,
+                    paces,
+                    startweekday=startweekday,
+                    startweekend=startweekend,
+                    transition=transition,
+                )
             else:
                 yield None
 
+    def toICalGen(
+        self,
+        weeknum,
+        weekdate,
+        startweekday=START_WEEKDAY,
+        startweekend=START_WEEKEND,
+        paces=None,
+        transition=TRANSITION,
+    ):
+        for event in self.toEventGen(weeknum, weekdate, startweekday, startweekend, paces, transition):
+            yield None if event is None else _toICal(event)
+
     def tableHeader(self):
         return "{:20}".format("") + " ".join(_tableGen(DAY_NAMES, self._lengths))
 
@@ -413,14 +714,9 @@ class Week:
         return [item.itemInRow(rowNum) for item in self]
 
     def __add__(self, other: "Week") -> "Week":
-        week = []
+        return Week(*[us + them for us, them in zip(self, other)])
 
-        for us, them in zip(self, other):
-            week.append(us + them)
-
-        return Week(*week)
-
-    def tableRows(self, weekdate, weeknum):
+    def tableRows(self, weekdate, weeknum, paces: Optional[PaceProfile] = None):
         numRow = 1
         for item in self:
             numRow = max(numRow, len(item))
@@ -428,7 +724,10 @@ class Week:
         # this prints the table version
         label = "{:%Y-%m-%d} Week {:2}: ".format(weekdate, weeknum)
         result = (
-            label + " ".join(_tableGen(self.__itemsInRow(0), self._lengths)) + " vol=" + timeDeltaToStr(self.volume())
+            label
+            + " ".join(_tableGen(self.__itemsInRow(0), self._lengths))
+            + " vol="
+            + timeDeltaToStr(self.volume(paces))
         )
         for i in range(1, numRow):
             result += "\n" + " " * len(label) + " ".join(_tableGen(self.__itemsInRow(i), self._lengths))
@@ -459,6 +758,7 @@ def _tableGen(week, lengths):
 
 
 def findLengths(training):
+    # widths come from the summaries rather than planToArray, items that cannot be timed still print
     lengths = [3] * len(DAY_NAMES)
     for week in training:
         for i, day in enumerate(week):
@@ -471,6 +771,64 @@ def findLengths(training):
     return lengths
 
 
+def _emptyPlanArray(shape) -> np.ndarray:
+    array = np.zeros(shape, dtype=PLAN_DTYPE)
+    array["sport"] = EMPTY_SLOT
+    array["timed"] = True  # empty slots take no time whatever the pace
+    return array
+
+
+def planToArray(training) -> np.ndarray:
+    """Combine the weeks of a plan into a PLAN_DTYPE array of shape (week, day, slot)"""
+    weeks = [week.toArray() for week in training]
+    slots = max([week.shape[-1] for week in weeks], default=1)
+    array = _emptyPlanArray((len(weeks), len(DAY_NAMES), slots))
+    for i, week in enumerate(weeks):
+        array[i, :, : week.shape[-1]] = week
+    return array
+
+
+def plansToArray(plans) -> np.ndarray:
+    """Stack several plans into a PLAN_DTYPE array of shape (plan, week, day, slot). Shorter plans are padded
+    at the start so that every plan ends with its race week."""
+    arrays = [planToArray(training) for training in plans]
+    weeks = max([array.shape[0] for array in arrays], default=0)
+    slots = max([array.shape[-1] for array in arrays], default=1)
+    stacked = _emptyPlanArray((len(arrays), weeks, len(DAY_NAMES), slots))
+    for i, array in enumerate(arrays):
+        stacked[i, weeks - array.shape[0] :, :, : array.shape[-1]] = array
+    return stacked
+
+
+def weeklyVolume(array: np.ndarray, field: str = "minutes") -> np.ndarray:
+    """Minutes per week from planToArray or plansToArray, shape (..., week)"""
+    return array[field].sum(axis=(-2, -1))
+
+
+def rollingLoad(array: np.ndarray, weeks: int = 4, field: str = "minutes") -> np.ndarray:
+    """Minutes over the trailing ``weeks`` weeks, including the current one, shape (..., week)"""
+    total = np.cumsum(weeklyVolume(array, field), axis=-1)
+    total[..., weeks:] -= total[..., :-weeks].copy()
+    return total
+
+
+def athleteMinutes(array: np.ndarray, profiles, roundUp: bool = False) -> np.ndarray:
+    """Minutes for every slot of planToArray or plansToArray for each of the athletes' PaceProfiles, shape
+    (athlete, ...). This is the distance of each item times the pace for its sport and kind."""
+    paces = np.stack([profile.toArray() for profile in profiles])  # (athlete, sport, kind)
+    minutes = array["distance"] * paces[:, array["sport"], array["kind"]]
+    minutes = _roundUpMinutes(minutes) if roundUp else np.floor(minutes)
+    return np.where(array["timed"], array["rounded" if roundUp else "minutes"], minutes)
+
+
+def sportVolume(array: np.ndarray, field: str = "minutes") -> np.ndarray:
+    """Minutes per week for each of SPORTS, shape (..., week, sport)"""
+    values = array[field]
+    return np.stack(
+        [np.where(array["sport"] == code, values, 0.0).sum(axis=(-2, -1)) for code in range(len(SPORTS))], axis=-1
+    )
+
+
 @pytest.mark.parametrize(
     "summary, expminutes",
     [
@@ -548,6 +906,55 @@ def test_timing(summary, expminutes, expminutesround):
     assert minutes == expminutes, "volume {} == {}".format(minutes, expminutes)
 
 
+@pytest.mark.parametrize(
+    "summary, sport, distance, duration",
+    [
+        ("Rest", "rest", 0.0, 0),
+        ("Run 25 min", "run", 0.0, 25),
+        ("60 min cross", "cross", 0.0, 60),
+        ("Swim 1602 m", "swim", 1.602 / KM_PER_MILE, None),
+        ("Bike 24 miles", "bike", 24.0, None),
+        ("Marathon", "run", 26.2, None),
+    ],
+)
+def test_workout(summary, sport, distance, duration):
+    workout = TrainingItem(summary).workout
+    assert workout.sport == sport
+    assert workout.distance == pytest.approx(distance)
+    if duration is None:
+        assert workout.duration is None
+    else:
+        assert workout.duration == workout.raw == workout.rounded == timedelta(minutes=duration)
+
+
+@pytest.mark.parametrize(
+    "description, rpe",
+    [
+        ("Tempo RPE 7", 7.0),
+        ("Moderate RPE 6-7", 6.5),
+        ("Long RPE 6 + strength", 6.0),
+        ("Easy 60 minute bike ride", KIND_RPE["easy"]),
+        ("Bike 60 min", KIND_RPE[""]),
+    ],
+)
+def test_rpe(description, rpe):
+    assert TrainingItem("Bike 60 min", description).workout.rpe == rpe
+    assert REST.workout.rpe == 0.0
+    assert TrainingItem("Bike 60 min", description).toRecord()[PLAN_DTYPE.names.index("rpe")] == rpe
+    # an item without a workout reports why rather than failing on the missing rpe
+    with pytest.raises(RuntimeError):
+        TrainingItem("Juggle for a while", description).toRecord()
+
+
+def test_workout_unknown():
+    obj = TrainingItem("blah")  # constructing is fine
+    assert obj.workout is None
+    with pytest.raises(RuntimeError):
+        obj.toTimeDelta()
+    with pytest.raises(ValueError):
+        TrainingItem("Swim laps").volume()
+
+
 def test_descr():
     summ, descr = ("summary", "description")
 
@@ -567,6 +974,49 @@ def test_equal():
     assert TrainingItem("foo") != TrainingItem("bar")
 
 
+def test_interned():
+    assert TrainingItem("Run 5 km") is TrainingItem("Run 5 km")
+    assert TrainingItem("Run 5 km") is TrainingItem("Run 5 km", "Run 5 km")
+    assert TrainingItem("Run 5 km") is not TrainingItem("Run 5 km", "Easy")
+    assert toRunItem("rest") is REST
+    assert deepcopy(REST) is REST
+
+    with pytest.raises(AttributeError):
+        REST.summary = "Run 5 km"
+    day = TrainingDay(REST, RACE)
+    with pytest.raises(AttributeError):
+        day.extra = 1
+    week = Week(REST, REST, REST, REST, REST, REST, day)
+    with pytest.raises(AttributeError):
+        week.sun = REST
+
+    lengths = [5] * len(DAY_NAMES)
+    assert week.withTableLengths(lengths)._lengths == tuple(lengths)
+    assert week._lengths is None  # original is unchanged
+
+
+def test_equal_structure():
+    swim = TrainingItem("Swim 500 m")
+    bike = TrainingItem("Bike 30 min")
+    assert TrainingDay(swim, bike) == TrainingDay([swim], [bike])
+    assert TrainingDay(swim, bike) != TrainingDay(bike, swim)
+    assert TrainingDay(swim, bike) != TrainingDay(swim, swim)  # same length is not enough
+    assert TrainingDay(swim) == swim
+    assert hash(TrainingDay(swim)) == hash(swim)
+    assert len({TrainingItem(" - "), TrainingItem("-"), REST, RACE}) == 2
+    # text never compares equal, so equality agrees with the hashes
+    assert swim != "Swim 500 m" and TrainingDay(swim) != "Swim 500 m"
+    assert "Swim 500 m" not in {swim}
+    assert not TrainingItem("RACE DAY", "Goal pace").shouldConvertToICal()
+    assert TrainingItem("RACE DAY ", "RACE DAY").key == RACE.key
+
+    week = Week(REST, swim, TrainingDay(swim, bike), REST, REST, REST, RACE)
+    assert week == Week(REST, swim, TrainingDay(swim, bike), REST, REST, REST, RACE)
+    assert week == week.withTableLengths([3] * len(DAY_NAMES))
+    assert week != Week(REST, swim, TrainingDay(bike, swim), REST, REST, REST, RACE)
+    assert len({week, week.withTableLengths([3] * len(DAY_NAMES))}) == 1
+
+
 def test_training_day():
     # setup training items
     item1 = TrainingItem("summary", "description")
@@ -610,6 +1060,49 @@ def test_triathlon():
     assert minutes == np.sum(MINUTES), "volume {} == {}".format(minutes, np.sum(MINUTES))
 
 
+def test_triathlon_events():
+    swim = TrainingItem("Easy 10 minute swim")
+    bike = TrainingItem("Easy 30 minute bike")
+    run = TrainingItem("Easy 15 minute run")
+    day = TrainingDay([swim, bike, run, REST])
+    monday = date(2020, 3, 16)
+
+    # back to back from the start of the day, only the first has a reminder
+    events = day.toCalendarEvents(startdate=monday, dayofweek=1)
+    assert [event.summary for event in events] == ["Easy 10 minute swim", "Easy 30 minute bike", "Easy 15 minute run"]
+    assert [event.start.time() for event in events] == [time(7, 30), time(7, 40), time(8, 10)]
+    assert events[-1].end == datetime(2020, 3, 17, 8, 25)
+    assert [event.alarm for event in events] == [ALARM, None, None]
+
+    # with transitions on a weekend
+    events = day.toCalendarEvents(startdate=monday, dayofweek=5, transition=timedelta(minutes=5), startweekend=(9, 0))
+    assert [event.start for event in events] == [
+        datetime(2020, 3, 21, 9, 0),
+        datetime(2020, 3, 21, 9, 15),
+        datetime(2020, 3, 21, 9, 50),
+    ]
+    assert all(event.alarm is None for event in events)
+
+    # distances are chained by how long they actually take, only the last is rounded up to the hour
+    brick = TrainingDay([TrainingItem("Swim 500 m"), TrainingItem("Bike 10 miles")])
+    events = brick.toCalendarEvents(startdate=monday, dayofweek=2)
+    assert [(event.start.time(), event.end.time()) for event in events] == [
+        (time(7, 30), time(7, 46)),
+        (time(7, 46), time(8, 46)),
+    ]
+    # a single workout still blocks out its rounded time
+    assert TrainingItem("Swim 500 m").toCalendarEvent(startdate=monday, dayofweek=2).end.time() == time(8, 30)
+
+    week = Week(REST, day, swim, REST, REST, REST, RACE)
+    events = list(week.toEventGen(3, monday, startweekday=(6, 0)))
+    assert events[0] is None
+    assert [event.start.time() for event in events[1:4]] == [time(6, 0), time(6, 10), time(6, 40)]
+    assert events[4].start == datetime(2020, 3, 18, 6, 0)
+    assert events[5:] == [None, None, None, None]
+    if WITH_ICAL:
+        assert len(day.toICalEvents(startdate=monday, dayofweek=1)) == 3
+
+
 def test_have_plans():
     # test object existance
     for item in [
@@ -651,6 +1144,84 @@ def test_add_day():
 
     result = day + day
     assert len(result) == 4
+    assert all(item is RUN_DAY for item in result)  # items are shared, not copied
+    assert result == TrainingDay(RUN_DAY, RUN_DAY, RUN_DAY, RUN_DAY)
+    assert day + REST is day
+
+
+def test_plan_array():
+    swim = TrainingItem("Swim 1602 m")
+    bike = TrainingItem("Bike 30 min")
+    run = TrainingItem("Run 5 miles")
+    plan = [
+        Week(REST, run, TrainingDay(swim, bike), REST, run, bike, REST),
+        Week(REST, run, REST, run, TrainingDay(swim, bike, run), REST, RACE),
+    ]
+    array = planToArray(plan)
+    assert array.shape == (2, len(DAY_NAMES), 3)
+    assert array[0, 2, 2]["sport"] == EMPTY_SLOT
+    assert array[1, 4, 2]["sport"] == SPORTS.index("run")
+    assert array[1, 4, 2]["distance"] == 5.0
+
+    volume = weeklyVolume(array)
+    assert volume.tolist() == [week.volume() / timedelta(minutes=1) for week in plan]
+    assert weeklyVolume(array, "rounded").tolist() == [240.0, 270.0]
+    assert rollingLoad(array, weeks=1).tolist() == volume.tolist()
+    assert rollingLoad(array).tolist() == np.cumsum(volume).tolist()
+
+    sports = sportVolume(array)
+    assert sports.shape == (2, len(SPORTS))
+    np.testing.assert_equal(sports.sum(axis=-1), volume)
+    assert sports[0, SPORTS.index("bike")] == 60.0
+    assert sports[1, SPORTS.index("run")] == 150.0
+
+    assert findLengths(plan) == [3, 11, 11, 11, 11, 11, 8]
+    assert findLengths(plan) == planToArray(plan)["width"].max(axis=(0, 2), initial=3).tolist()
+    # an item that cannot be timed still has a width
+    untimed = Week(REST, TrainingItem("Yoga 45"), REST, REST, REST, REST, REST)
+    assert findLengths([untimed]) == [3, 7, 3, 3, 3, 3, 3]
+    with pytest.raises(RuntimeError):
+        untimed.volume()
+
+    # plans are aligned on their last week
+    stacked = plansToArray([plan, plan[1:]])
+    assert stacked.shape == (2, 2, len(DAY_NAMES), 3)
+    np.testing.assert_equal(weeklyVolume(stacked), [volume, [0.0, volume[1]]])
+
+
+def test_pace_profile():
+    fast = PaceProfile(run=RunPace("8:00"), bike=BikePace(20.0), kinds={("run", "long"): RunPace("9:00")})
+    assert fast.pace("run") == 8.0
+    assert fast.pace("run", "long") == 9.0
+    assert fast.pace("swim", "long") == float(SPEED_SWIM)
+    with pytest.raises(RuntimeError):
+        fast.pace("cross")
+    with pytest.raises(ValueError):
+        PaceProfile(kinds={("cross", "easy"): RunPace(10.0)})
+
+    run = TrainingItem("Run 10 miles")
+    long_run = TrainingItem("Run 10 miles", "Long run")
+    assert long_run.workout.kind == "long"
+    assert run.volume(fast) == timedelta(minutes=80)
+    assert long_run.volume(fast) == timedelta(minutes=90)
+    assert long_run.toTimeDelta(paces=fast) == timedelta(minutes=90)
+    assert run.toTimeDelta(paces=fast) == timedelta(minutes=90)  # rounded up
+    assert TrainingItem("Bike 60 min").volume(fast) == timedelta(minutes=60)  # time does not depend on pace
+
+    week = Week(REST, run, TrainingDay(long_run, TrainingItem("Bike 24 miles")), REST, REST, REST, RACE)
+    assert week.volume() == timedelta(minutes=100 + 100 + 96)
+    assert week.volume(fast) == timedelta(minutes=80 + 90 + 72)
+    assert week.volume(DEFAULT_PACES) == week.volume()
+
+    # many athletes at once
+    plan = planToArray([week, week])
+    minutes = athleteMinutes(plan, [DEFAULT_PACES, fast])
+    assert minutes.shape == (2,) + plan.shape
+    np.testing.assert_equal(minutes[0], plan["minutes"])
+    assert minutes.sum(axis=(-2, -1)).tolist() == [[296.0, 296.0], [242.0, 242.0]]
+    rounded = athleteMinutes(plan, [DEFAULT_PACES, fast], roundUp=True)
+    np.testing.assert_equal(rounded[0], plan["rounded"])
+    assert rounded[1, 0, 2].tolist() == [90.0, 90.0]
 
 
 def test_add_week():
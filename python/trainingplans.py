@@ -1,5 +1,4 @@
 #!/usr/bin/env python
-from copy import deepcopy
 from trainingobjs import (
     findLengths,
     TrainingDay,
@@ -1175,7 +1174,7 @@ bike: TrainingCollection = {
 }  # Bike metric century
 
 # #### custom plan for 2021 - raw version
-rawWacky = deepcopy(triathlon["olympic"])
+rawWacky = list(triathlon["olympic"])  # weeks are immutable so they can be shared
 # pad with rest
 for i in range(8):
     rawWacky.append(Week(REST, REST, REST, REST, REST, REST, REST))
@@ -1223,11 +1222,11 @@ for i, descr in enumerate(
 ):
     wacky.append(makeWacky(running["marathon"][i], triathlon["olympic"][i + 2], descr))
 # race week
-wacky.append(deepcopy(triathlon["olympic"][-1]))
+wacky.append(triathlon["olympic"][-1])
 # copy over the remainder of the marathon weeks
-wacky.extend(deepcopy(running["marathon"][-8:-1]))
+wacky.extend(running["marathon"][-8:-1])
 # final week is special
-finalweek = deepcopy(running["marathon"][-1])
+finalweek = running["marathon"][-1]
 wacky.append(Week(REST, finalweek.mon, finalweek.tue, REST, finalweek.fri, REST, RACE))
 
 
@@ -1240,4 +1239,4 @@ trainingplans["wacky"] = wacky
 for name in trainingplans.keys():
     lengths = findLengths(trainingplans[name])
     for i in range(len(trainingplans[name])):
-        trainingplans[name][i].setTableLengths(lengths)
+        trainingplans[name][i] = trainingplans[name][i].withTableLengths(lengths)